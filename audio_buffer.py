@@ -0,0 +1,78 @@
+import numpy as np
+
+
+class PCMRingBuffer:
+    """Fixed-capacity int16 ring buffer with one producer and one consumer."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self._start = 0
+        self._size = 0
+        self.underruns = 0
+        self.high_water = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def free(self):
+        return self.capacity - self._size
+
+    @staticmethod
+    def to_int16(pcm):
+        """Convert a PCM packet (Orca list, bytes or ndarray) to int16 once."""
+        if isinstance(pcm, np.ndarray):
+            return pcm if pcm.dtype == np.int16 else pcm.astype(np.int16)
+        if isinstance(pcm, (bytes, bytearray, memoryview)):
+            return np.frombuffer(pcm, dtype=np.int16)
+        return np.array(pcm, dtype=np.int16)
+
+    def write(self, samples):
+        """Copy as many samples as fit and return how many were written."""
+        count = min(len(samples), self.free)
+        if count == 0:
+            return 0
+        end = (self._start + self._size) % self.capacity
+        first = min(count, self.capacity - end)
+        self._data[end:end + first] = samples[:first]
+        if count > first:
+            self._data[:count - first] = samples[first:count]
+        self._size += count
+        if self._size > self.high_water:
+            self.high_water = self._size
+        return count
+
+    def peek(self, count):
+        """Return a zero-copy view of up to count contiguous samples."""
+        count = min(count, self._size, self.capacity - self._start)
+        return self._data[self._start:self._start + count]
+
+    def consume(self, count):
+        self._start = (self._start + count) % self.capacity
+        self._size -= count
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+    def reset_stats(self):
+        self.underruns = 0
+        self.high_water = self._size
+
+
+def fill_ring(ring, pending, audio_queue, timeout=0.1):
+    """Move queued PCM into the ring.
+
+    A new packet is pulled from audio_queue only when nothing is pending.
+    Returns (leftover, finished) where leftover is the view that did not fit
+    and finished is True once the None end marker was read. Raises
+    queue.Empty on timeout.
+    """
+    if pending is None:
+        pcm = audio_queue.get(timeout=timeout)
+        if pcm is None:
+            return None, True
+        pending = PCMRingBuffer.to_int16(pcm)
+    written = ring.write(pending)
+    return (pending[written:] if written < len(pending) else None), False
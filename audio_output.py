@@ -0,0 +1,354 @@
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+from audio_buffer import PCMRingBuffer
+
+OUTPUT_SAMPLE_RATE = 48000  # Device rate before the first source picks one
+BLOCK_SECONDS = 2048 / 48000  # 43 ms, the same write cadence as 1024 samples at 22050 Hz
+SOURCE_BUFFER_SECONDS = 5
+
+
+class Resampler:
+    """Streaming linear-interpolation resampler for int16 mono PCM.
+
+    Works a block at a time with np.interp and carries the last input sample
+    and the fractional read position over to the next block, so a stream cut
+    into arbitrary packets resamples without clicks at the seams.
+    """
+
+    def __init__(self, in_rate, out_rate):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.step = in_rate / out_rate
+        self._last = None
+        self._position = 0.0
+
+    def process(self, samples):
+        samples = PCMRingBuffer.to_int16(samples)
+        if self.in_rate == self.out_rate or len(samples) == 0:
+            return samples
+        x = samples.astype(np.float32)
+        if self._last is not None:
+            x = np.concatenate(([self._last], x))
+        end = len(x) - 1
+        if end < self._position:
+            count = 0
+        else:
+            count = int((end - self._position) // self.step) + 1
+        positions = self._position + self.step * np.arange(count)
+        out = np.interp(positions, np.arange(len(x)), x)
+        self._position += self.step * count - end
+        self._last = x[-1]
+        return np.round(out).astype(np.int16)
+
+
+class AudioSource:
+    """One stream of PCM played through an AudioOutput.
+
+    write() resamples to the output rate, if it differs, and blocks while the
+    source already holds buffer_seconds of audio. end() lets the source finish
+    once its audio has played; stop() drops it immediately. A source made
+    from a whole clip at the output rate plays straight from the clip, e.g. a
+    memmapped PCM cache file, without copying it into a buffer first.
+    """
+
+    def __init__(self, output, sample_rate, gain=1.0, on_start=None, buffer_seconds=SOURCE_BUFFER_SECONDS, clip=None):
+        self.output = output
+        self.sample_rate = sample_rate
+        self.gain = gain
+        self.on_start = on_start
+        self.resampler = Resampler(sample_rate, output.sample_rate)
+        self.clip = None
+        self._clip_position = 0
+        if clip is not None and sample_rate == output.sample_rate:
+            self.clip = PCMRingBuffer.to_int16(clip)
+            buffer_seconds = 0
+        self.ring = PCMRingBuffer(max(int(output.sample_rate * buffer_seconds), output.block_size))
+        self.low_water = self.ring.capacity // 4  # Writers resume once this much space is free
+        self.started = False
+        self.ended = False
+        self.stopped = False
+        self.underruns = 0
+        self.done = threading.Event()
+        self.idle = threading.Event()  # Set whenever everything written so far has played
+        self.idle.set()
+        self._cond = threading.Condition()
+        if self.clip is not None:
+            self.ended = True
+            self.idle.clear()
+        elif clip is not None:
+            self.write(clip)
+            self.end()
+
+    def write(self, pcm):
+        samples = self.resampler.process(pcm)
+        while len(samples):
+            with self._cond:
+                while self.ring.free < min(len(samples), self.low_water) and not self.stopped:
+                    self._cond.wait()
+                if self.stopped:
+                    return
+                written = self.ring.write(samples)
+                self.idle.clear()
+            samples = samples[written:]
+            self.output._wake()
+
+    def end(self):
+        with self._cond:
+            self.ended = True
+        self.output._wake()
+
+    def stop(self):
+        with self._cond:
+            self.stopped = True
+            self.ring.clear()
+            self._cond.notify_all()
+        self.idle.set()
+        self.done.set()
+        self.output._wake()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def _take_clip(self, count):
+        chunk = self.clip[self._clip_position:self._clip_position + count]
+        self._clip_position += len(chunk)
+        return chunk
+
+    def _take_ring(self, count):
+        chunk = self.ring.peek(count).copy()  # The ring space is reused once consumed
+        self.ring.consume(len(chunk))
+        return chunk
+
+    def _read(self, count):
+        """Up to count samples as a list of int16 chunks; clip chunks are views, not copies."""
+        with self._cond:
+            if self.stopped:
+                return []
+            available = len(self.clip) - self._clip_position if self.clip is not None else len(self.ring)
+            if not self.started and available < count and not self.ended:
+                return []  # Let the first block fill up before starting
+            take = self._take_clip if self.clip is not None else self._take_ring
+            chunks = []
+            filled = 0
+            while filled < count:
+                chunk = take(count - filled)
+                if len(chunk) == 0:
+                    break
+                chunks.append(chunk)
+                filled += len(chunk)
+            if filled < count:
+                if self.ended:
+                    self.done.set()
+                elif self.started:
+                    self.underruns += 1
+            if available == filled:
+                self.idle.set()
+            self.started = self.started or filled > 0
+            if self.ring.free >= self.low_water:
+                self._cond.notify_all()
+            return chunks
+
+    def _mix_into(self, block):
+        """Add up to len(block) samples to block; returns the number added."""
+        filled = 0
+        for chunk in self._read(len(block)):
+            block[filled:filled + len(chunk)] += chunk * self.gain if self.gain != 1.0 else chunk
+            filled += len(chunk)
+        return filled
+
+
+class NullStream:
+    """sounddevice.OutputStream look-alike for headless runs.
+
+    Blocks for as long as the audio would take to play; speed > 1 plays
+    faster than real time.
+    """
+
+    def __init__(self, samplerate, channels=1, dtype="int16", speed=1.0, **kwargs):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.speed = speed
+        self.frames = 0
+
+    def write(self, data):
+        self.frames += len(data)
+        time.sleep(len(data) / self.samplerate / self.speed)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class AudioOutput:
+    """A single long-lived output stream shared by every player in the process.
+
+    Sources opened with queue=True play one after another, like the replies
+    of a conversation; the others are mixed on top of whatever is playing,
+    e.g. an earcon over speech. The device is opened on first use and stays
+    open; while nothing is playing the mixer thread sleeps without writing.
+    Unless sample_rate is given, the device runs at the rate of the source
+    opened while nothing was playing, and is only reopened when that rate
+    changes, so a single TTS backend plays at its native rate and only
+    sources that join at another rate are resampled. A lone source at full
+    gain is written to the device as is, without mixing. output_stream is a
+    sounddevice.OutputStream-like factory, NullStream for a null sink.
+    """
+
+    def __init__(self, sample_rate=None, block_seconds=BLOCK_SECONDS, output_stream=None):
+        self.follow_rate = sample_rate is None
+        self.block_seconds = block_seconds
+        self.output_stream = output_stream
+        self.device_opens = 0
+        self.blocks = 0
+        self.resampled_sources = 0
+        self._mixed = []
+        self._queued = deque()
+        self._cond = threading.Condition()
+        self._stream = None
+        self._reopen = False
+        self._thread = None
+        self._closed = False
+        self._set_rate(OUTPUT_SAMPLE_RATE if sample_rate is None else sample_rate)
+
+    def _set_rate(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.block_size = max(int(round(self.block_seconds * sample_rate)), 1)
+        self._reopen = self._stream is not None
+
+    def _open_stream(self):
+        factory = self.output_stream
+        if factory is None:
+            import sounddevice as sd
+            factory = sd.OutputStream
+        self._stream = factory(samplerate=self.sample_rate, channels=1, dtype="int16", blocksize=self.block_size)
+        self._stream.start()
+        self.device_opens += 1
+        self._reopen = False
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._open_stream()
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def open_source(self, sample_rate, queue=False, gain=1.0, on_start=None, buffer_seconds=SOURCE_BUFFER_SECONDS,
+                    clip=None):
+        with self._cond:
+            if self.follow_rate and sample_rate != self.sample_rate and not (self._mixed or self._queued):
+                # Nothing is playing, so the device can switch to this rate instead of resampling it
+                self._set_rate(sample_rate)
+            self.start()
+            if sample_rate != self.sample_rate:
+                self.resampled_sources += 1
+            source = AudioSource(self, sample_rate, gain, on_start, buffer_seconds, clip)
+            (self._queued if queue else self._mixed).append(source)
+            self._cond.notify()
+        return source
+
+    def play(self, pcm, sample_rate, queue=False, gain=1.0, on_start=None):
+        """Play a whole clip without blocking; returns its AudioSource."""
+        seconds = len(pcm) / sample_rate + self.block_seconds
+        return self.open_source(sample_rate, queue, gain, on_start, buffer_seconds=seconds + 0.1, clip=pcm)
+
+    def stop_all(self):
+        with self._cond:
+            sources = list(self._mixed) + list(self._queued)
+        for source in sources:
+            source.stop()
+
+    def is_playing(self):
+        with self._cond:
+            return bool(self._mixed or self._queued)
+
+    def close(self):
+        self.stop_all()
+        with self._cond:
+            self._closed = True
+            self._mixed = []
+            self._queued.clear()
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _run(self):
+        block = np.zeros(self.block_size, dtype=np.float32)
+        while True:
+            with self._cond:
+                while not self._closed and not (self._mixed or self._queued):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                if self._reopen:
+                    # Only the mixer thread writes to the device, so the old stream is done with
+                    self._stream.stop()
+                    self._stream.close()
+                    self._open_stream()
+                if len(block) != self.block_size:
+                    block = np.zeros(self.block_size, dtype=np.float32)
+                sources = list(self._mixed)
+                if self._queued:
+                    sources.append(self._queued[0])
+
+            starting = [source for source in sources if not source.started]
+            if len(sources) == 1 and sources[0].gain == 1.0:
+                # Nothing to mix: pass the int16 samples through untouched
+                chunks = sources[0]._read(self.block_size)
+                filled = sum(len(chunk) for chunk in chunks)
+                if filled < self.block_size and filled:
+                    chunks.append(np.zeros(self.block_size - filled, dtype=np.int16))
+                out = chunks[0] if len(chunks) == 1 else np.concatenate(chunks) if chunks else None
+            else:
+                block[:] = 0
+                filled = 0
+                for source in sources:
+                    filled = max(filled, source._mix_into(block))
+                out = np.clip(block, -32768, 32767).astype(np.int16)
+            starting = [source for source in starting if source.started]
+
+            with self._cond:
+                self._mixed = [source for source in self._mixed if not source.done.is_set()]
+                while self._queued and self._queued[0].done.is_set():
+                    self._queued.popleft()
+                if filled == 0:
+                    # Nothing to play yet; sleep until a source is written to
+                    self._cond.wait(self.block_size / self.sample_rate)
+                    continue
+
+            self._stream.write(out)
+            self.blocks += 1
+            for source in starting:
+                if source.on_start is not None:
+                    source.on_start()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_output():
+    """The process-wide AudioOutput. AUDIO_OUTPUT=null plays into a NullStream."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = AudioOutput(output_stream=NullStream if os.getenv("AUDIO_OUTPUT") == "null" else None)
+        return _shared
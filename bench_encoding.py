@@ -0,0 +1,67 @@
+"""CPU cost against bytes saved for the STT upload encodings in stt_encoding.py.
+
+Encodes synthetic voiced audio in capture-sized chunks through an
+EncodingSender, the way pixie.py streams to Deepgram, and reports the CPU
+time per second of audio (the share of one core a stream needs) and the
+upload bitrate. Opus is skipped when opuslib is not installed.
+
+    python bench_encoding.py --seconds 60
+"""
+import argparse
+import time
+import numpy as np
+from stt_encoding import ENCODINGS, EncodingSender, create_encoder
+
+SAMPLE_RATE = 16000
+CHUNK = 1024  # pixie.py's MIC_CHUNK
+
+
+def voiced_audio(seconds, sample_rate=SAMPLE_RATE, seed=0):
+    """Harmonic "speech" with a syllable-rate envelope and background noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    audio = 6000 * voice * envelope + rng.normal(0, 200, len(t))
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def run(encoding, pcm):
+    encoder = create_encoder(encoding, SAMPLE_RATE)
+    chunk = CHUNK if encoder is None else encoder.align(CHUNK)
+    sent = []
+    if encoder is None:
+        feed, close = sent.append, lambda: None
+    else:
+        sender = EncodingSender(sent.append, encoder)
+        feed, close = sender.feed, sender.close
+    cpu_start = time.process_time()
+    for start in range(0, len(pcm), chunk):
+        feed(pcm[start:start + chunk].tobytes())
+    close()  # Waits for the worker to drain
+    cpu = time.process_time() - cpu_start
+    return cpu, sum(len(data) for data in sent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30)
+    args = parser.parse_args()
+
+    pcm = voiced_audio(args.seconds)
+    print(f"{'encoding':<10}{'cpu/s audio':>13}{'kbps':>8}{'saved':>8}")
+    for encoding in ENCODINGS:
+        try:
+            cpu, size = run(encoding, pcm)
+        except ImportError as e:
+            print(f"{encoding:<10}skipped: {e}")
+            continue
+        kbps = size * 8 / args.seconds / 1000
+        saved = 1 - size / (len(pcm) * 2)
+        print(f"{encoding:<10}{cpu / args.seconds * 1000:>10.2f} ms{kbps:>8.0f}{saved:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""End-to-end latency benchmark for the speech2speech loop in pixie.py.
+
+pixie.py runs unchanged against local fakes (fakes.py): an OpenAI-style
+streaming server in place of Groq, a Deepgram-protocol websocket that replays
+SCRIPT as interim and final transcripts, a fake Orca at a fixed real-time
+factor, and null microphone and speaker devices. Needs no API keys, audio
+hardware or network access.
+
+Turn latency is the time from the final transcript to the first write to the
+speaker, taken from pixie's tracer along with the other per-stage spans. CPU
+is the whole process, fakes included.
+
+    python bench_pipeline.py --conversations 5 --ttft 0.15 --token-delay 0.02
+"""
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import resource
+import tempfile
+import threading
+import time
+from audio_output import NullStream
+from fakes import FakeDeepgramTranscriptServer, FakeGroqServer, FakeOrca, NullRecorder
+
+SCRIPT = [
+    "what's the capital of france",
+    "tell me a fun fact about octopuses",
+    "how do I boil an egg",
+    "thanks that's all goodbye",
+]
+REPLY = ("Sure, here is a quick answer for you. Octopuses have three hearts and blue blood, "
+         "and each arm can taste what it touches. Anything else?")
+TURN_TIMEOUT = 30
+
+
+def load_pixie(args, groq_server, stt_server):
+    os.environ.update({
+        "GROQ_API_KEY": "fake",
+        "GROQ_BASE_URL": groq_server.base_url,
+        "DEEPGRAM_API_KEY": "fake",
+        "DEEPGRAM_URL": stt_server.http_url,
+        "PICOVOICE_ACCESS_KEY": "fake",
+        "TTS_BACKEND": "fake-orca",
+        "PCM_CACHE_DIR": tempfile.mkdtemp(prefix="pixie-bench-"),
+        "INTENT_CACHE_PATH": "",
+        "TRACE_PATH": "",
+        "AUDIO_OUTPUT": "null",
+        "SPECULATE": "1" if args.speculate else "0",
+        "SPECULATION_STABLE_MS": str(args.speculation_ms),
+        "HEDGE_REQUESTS": "1" if args.hedge else "0",
+        "HEDGE_MAX_RATE": str(args.hedge_max_rate),
+    })
+    from tts_backends import OrcaBackend, register_backend
+    register_backend("fake-orca", lambda: OrcaBackend(None, engine=FakeOrca(rtf=args.tts_rtf)))
+    import pixie
+    from tracing import Tracer
+    pixie.tracer = pixie.tts_manager.tracer = Tracer(enabled=True)
+    pixie.capture.recorder = NullRecorder
+    pixie.audio_output.output_stream = functools.partial(NullStream, speed=args.playback_speed)
+    return pixie
+
+
+def run_conversation(pixie, stt_server, turn_done):
+    pixie.tracer.begin_turn("wake")
+    pixie.turn_open = True
+    conversation = threading.Thread(target=pixie.speech2speech)
+    conversation.start()
+    # pixie listens once the greeting has played; the silent microphone itself is gated out
+    deadline = time.monotonic() + TURN_TIMEOUT
+    while pixie.microphone is None or pixie.tts_manager.is_busy():
+        if time.monotonic() > deadline:
+            raise RuntimeError("pixie never started listening")
+        time.sleep(0.01)
+    for utterance in SCRIPT:
+        turn_done.clear()
+        stt_server.say(utterance)
+        if not turn_done.wait(TURN_TIMEOUT):
+            raise RuntimeError(f"turn timed out: {utterance!r}")
+    conversation.join(TURN_TIMEOUT)
+    pixie.tts_manager.reset()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=3)
+    parser.add_argument("--ttft", type=float, default=0.15, help="seconds to the first LLM token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds per LLM token")
+    parser.add_argument("--intent-delay", type=float, default=0.1, help="seconds per intent request")
+    parser.add_argument("--tts-rtf", type=float, default=0.1, help="real-time factor of the fake Orca")
+    parser.add_argument("--playback-speed", type=float, default=4, help="how much faster than real time the null speaker plays")
+    parser.add_argument("--word-delay", type=float, default=0.15, help="seconds between interim transcripts")
+    parser.add_argument("--final-delay", type=float, default=None,
+                        help="seconds from the last interim to the final transcript (default: --word-delay)")
+    parser.add_argument("--speculate", action="store_true", help="classify stable interim transcripts early")
+    parser.add_argument("--speculation-ms", type=float, default=300, help="how long an interim must stay unchanged")
+    parser.add_argument("--spike-rate", type=float, default=0.0, help="fraction of LLM requests that stall")
+    parser.add_argument("--spike-delay", type=float, default=2.0, help="seconds a stalled LLM request stalls for")
+    parser.add_argument("--hedge", action="store_true", help="duplicate LLM requests that run past their p90")
+    parser.add_argument("--hedge-max-rate", type=float, default=0.1, help="upper bound on duplicates per request")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show pixie's own output")
+    args = parser.parse_args()
+
+    groq_server = FakeGroqServer(REPLY, ttft=args.ttft, token_delay=args.token_delay,
+                                 intent_delay=args.intent_delay, spike_rate=args.spike_rate,
+                                 spike_delay=args.spike_delay).start()
+    stt_server = FakeDeepgramTranscriptServer(word_delay=args.word_delay, final_delay=args.final_delay).start()
+    pixie = load_pixie(args, groq_server, stt_server)
+
+    turn_done = threading.Event()
+    process = pixie.process
+
+    def process_and_signal(*process_args):
+        try:
+            process(*process_args)
+        finally:
+            turn_done.set()
+
+    pixie.process = process_and_signal
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        pixie.stt_manager.warm()
+        pixie.tts_manager.prewarm(pixie.PREWARM_PHRASES)
+        wall_start = time.perf_counter()
+        usage_start = resource.getrusage(resource.RUSAGE_SELF)
+        for _ in range(args.conversations):
+            run_conversation(pixie, stt_server, turn_done)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        wall = time.perf_counter() - wall_start
+        pixie.stt_manager.close()
+        pixie.capture.stop()
+        pixie.tts_manager.cleanup()
+        pixie.audio_output.close()
+        pixie.turn_executor.shutdown()
+        if pixie.speculator is not None:
+            pixie.speculator.close()
+        for hedger in (pixie.llm_hedger, pixie.intent_hedger):
+            if hedger is not None:
+                hedger.close()
+    groq_server.stop()
+    stt_server.stop()
+
+    turns = args.conversations * len(SCRIPT)
+    cpu = (usage.ru_utime - usage_start.ru_utime) + (usage.ru_stime - usage_start.ru_stime)
+    latency = pixie.tracer.percentiles("final_to_first_audio")
+    turn = pixie.tracer.percentiles("playback_first_write")
+    ttft = pixie.tracer.percentiles("llm_ttft")
+    print(pixie.tracer.report())
+    print("\nturn latency (final transcript to first audio): "
+          + ", ".join(f"p{p} {value:.0f}ms" for p, value in latency.items()))
+    print("turn from wake word or first transcript to first audio: "
+          + ", ".join(f"p{p} {value:.0f}ms" for p, value in turn.items()))
+    print("LLM time to first token: " + ", ".join(f"p{p} {value:.0f}ms" for p, value in ttft.items())
+          + f" ({groq_server.spikes} stalled requests, {groq_server.cancelled} cancelled streams)")
+    print(f"cpu {cpu:.2f}s over {wall:.1f}s wall ({cpu / wall:.0%}), {cpu / turns * 1000:.0f}ms per turn, "
+          f"{turns} turns, {groq_server.requests} LLM requests, {stt_server.connections} STT connections")
+    if pixie.speculator is not None:
+        print(f"speculation: {pixie.speculator.stats()}")
+    for hedger in (pixie.llm_hedger, pixie.intent_hedger):
+        if hedger is not None:
+            print(f"hedging {hedger.name}: {hedger.stats()}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "turns": turns,
+                "spans": {name: {str(k): v for k, v in stats.items()} for name, stats in pixie.tracer.stats().items()},
+                "cpu_seconds": cpu,
+                "wall_seconds": wall,
+                "llm_requests": groq_server.requests,
+                "speculation": pixie.speculator.stats() if pixie.speculator is not None else None,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Time-to-first-audio benchmark for the TTS backends in tts_backends.py.
+
+Every backend runs against a local fake (fakes.py), fed sentence by sentence
+the way pixie.py streams LLM output, and plays into a real-time paced null
+sink. Reports time-to-first-audio, real-time factor and playback underruns.
+
+    python bench_tts.py --rtf 0.2 --token-delay 0.03 --runs 5
+"""
+import argparse
+import statistics
+import threading
+import time
+from audio_buffer import PCMRingBuffer
+from fakes import FakeDeepgramSpeakServer, FakeOrca
+from tts_backends import DeepgramSDKBackend, DeepgramSpeakBackend, OrcaBackend
+
+SENTENCES = [
+    "Sure, here is what I found. ",
+    "It will be mostly sunny this afternoon, with a light breeze from the west. ",
+    "Temperatures should reach about twenty four degrees before cooling off tonight. ",
+    "You probably won't need an umbrella. ",
+]
+CHUNK = 1024
+
+
+class NullSink:
+    """Consumes PCM from a ring buffer at real-time speed, like an output device."""
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.ring = PCMRingBuffer(sample_rate * 30)
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.first_audio = None
+        self.last_audio = None
+        self.samples = 0
+        self.started = False
+        self._thread = threading.Thread(target=self._play, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def write(self, pcm):
+        samples = PCMRingBuffer.to_int16(pcm)
+        with self.lock:
+            if len(samples):
+                self.last_audio = time.perf_counter()
+                if self.first_audio is None:
+                    self.first_audio = self.last_audio
+            self.samples += len(samples)
+            self.ring.write(samples)
+
+    def join(self):
+        self.finished.set()
+        self._thread.join()
+
+    def _play(self):
+        starved = False
+        while True:
+            with self.lock:
+                count = len(self.ring.peek(CHUNK))
+                self.ring.consume(count)
+            if count:
+                self.started = True
+                starved = False
+                time.sleep(count / self.sample_rate)
+            elif self.finished.is_set():
+                return
+            else:
+                if self.started and not starved:
+                    self.ring.underruns += 1
+                    starved = True
+                time.sleep(0.005)
+
+
+def run_once(backend, token_delay):
+    sink = NullSink(backend.sample_rate)
+    sink.start()
+    start = time.perf_counter()
+    stream = backend.open_stream(sink.write)
+    for sentence in SENTENCES:
+        time.sleep(token_delay * len(sentence.split()))  # LLM producing the sentence
+        pcm = stream.synthesize(sentence)
+        if pcm is not None:
+            sink.write(pcm)
+    pcm = stream.flush()
+    if pcm is not None:
+        sink.write(pcm)
+    stream.close()
+    sink.join()
+    audio_seconds = sink.samples / backend.sample_rate
+    return {
+        "ttfa": sink.first_audio - start,
+        # Delivery time per second of audio; above 1.0 playback has to stall
+        "rtf": (sink.last_audio - sink.first_audio) / audio_seconds,
+        "underruns": sink.ring.underruns,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtf", type=float, default=0.2, help="real-time factor of the fake engines")
+    parser.add_argument("--token-delay", type=float, default=0.03, help="seconds per LLM token")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    server = FakeDeepgramSpeakServer(rtf=args.rtf).start()
+    backends = {
+        "orca": lambda: OrcaBackend(None, engine=FakeOrca(rtf=args.rtf)),
+        "deepgram": lambda: DeepgramSpeakBackend(api_key="fake", url=f"{server.url}/v1/speak"),
+        "deepgram-sdk": lambda: DeepgramSDKBackend(api_key="fake", url=server.http_url),
+    }
+
+    print(f"{'backend':<14}{'ttfa p50':>10}{'ttfa max':>10}{'rtf':>8}{'underruns':>11}")
+    for name, factory in backends.items():
+        backend = factory()
+        try:
+            results = [run_once(backend, args.token_delay) for _ in range(args.runs)]
+        finally:
+            backend.delete()
+        ttfa = [r["ttfa"] for r in results]
+        print(f"{name:<14}{statistics.median(ttfa) * 1000:>8.0f}ms{max(ttfa) * 1000:>8.0f}ms"
+              f"{statistics.mean(r['rtf'] for r in results):>8.2f}{sum(r['underruns'] for r in results):>11}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Tokens sent to the LLM and extraction accuracy for saved weather pages.
+
+Each page in fixtures/weather is run through weather_trim the way
+weather_context.weather_report() does it: a page whose weather widget can be
+read directly sends nothing to the LLM, any other page is trimmed to the
+token budget. expected.json lists, per page, whether direct extraction should
+work and either the fields it should find or facts the trimmed text must keep.
+Runs offline.
+
+    python bench_weather.py --budget 300
+"""
+import argparse
+import json
+import os
+import time
+from history import estimate_tokens
+from weather_trim import WEATHER_TOKEN_BUDGET, parse_weather, trim_weather_text
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "weather")
+
+
+def field_accuracy(weather, expected):
+    if weather is None:
+        return 0, len(expected)
+    found = json.loads(json.dumps(weather))  # Forecast tuples as lists, like expected.json
+    return sum(found.get(name) == value for name, value in expected.items()), len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=WEATHER_TOKEN_BUDGET, help="token budget for trimmed text")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--repeat", type=int, default=200, help="runs per page for the timing")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.fixtures, "expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+
+    totals = {"raw": 0, "sent": 0, "correct": 0, "checked": 0, "llm_calls": 0}
+    print(f"{'page':<28}{'raw tok':>9}{'sent tok':>10}{'direct':>8}{'accuracy':>10}{'ms':>8}")
+    for name, page in sorted(expected.items()):
+        with open(os.path.join(args.fixtures, name), encoding="utf-8") as f:
+            text = f.read()
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            weather = parse_weather(text)
+            trimmed = trim_weather_text(text, args.budget) if weather is None else ""
+        elapsed = (time.perf_counter() - start) / args.repeat * 1000
+
+        if page["direct"]:
+            correct, checked = field_accuracy(weather, page["fields"])
+        else:
+            # No widget: what matters is that the trimmed text still holds the facts
+            correct = 0 if weather is not None else sum(fact in trimmed for fact in page["facts"])
+            checked = len(page["facts"])
+        sent = estimate_tokens(trimmed)
+        totals["raw"] += estimate_tokens(text)
+        totals["sent"] += sent
+        totals["correct"] += correct
+        totals["checked"] += checked
+        totals["llm_calls"] += bool(trimmed)
+        accuracy = f"{correct}/{checked}" if checked else "-"
+        print(f"{name:<28}{estimate_tokens(text):>9}{sent:>10}{'yes' if weather else 'no':>8}{accuracy:>10}{elapsed:>8.2f}")
+
+    print(f"\n{totals['sent']} of {totals['raw']} tokens sent ({totals['sent'] / totals['raw']:.0%}), "
+          f"{totals['llm_calls']} of {len(expected)} pages need the LLM, "
+          f"{totals['correct']}/{totals['checked']} expected fields and facts kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache with a per-entry TTL and an optional JSON snapshot.
+
+    Values must be JSON serializable when a snapshot path is given.
+    """
+
+    def __init__(self, max_size=256, ttl=3600, path=None, clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= self.clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, ttl=None):
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable cache snapshot {self.path}: {e}")
+            return
+        now = self.clock()
+        with self._lock:
+            # Snapshot is stored least recently used first
+            for key, value, expires_at in entries:
+                if expires_at > now:
+                    self._entries[key] = (value, expires_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        if not self.path:
+            return
+        now = self.clock()
+        with self._lock:
+            entries = [[key, value, expires_at] for key, (value, expires_at) in self._entries.items()
+                       if expires_at > now]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hit_rate}
+
+
+class SQLiteTTLCache:
+    """LRU cache in memory over a SQLite table, so entries survive restarts.
+
+    Each entry is fresh for its ttl and then stale for another stale_ttl
+    seconds. fetch() serves a stale entry straight away and reloads it on a
+    background thread (stale-while-revalidate); only a miss waits for the
+    loader. The table is trimmed to max_rows, least recently used first.
+    Values must be JSON serializable. path may be ":memory:".
+    """
+
+    def __init__(self, path, table="cache", max_size=128, max_rows=2048, ttl=600, stale_ttl=3600, clock=time.time):
+        self.path = path
+        self.table = table
+        self.max_size = max_size
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (value, expires_at, stale_until)
+        self._refreshing = set()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                             "expires_at REAL NOT NULL, stale_until REAL NOT NULL, used_at REAL NOT NULL)")
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_used_at ON {table} (used_at)")
+        self.prune()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def _lookup(self, key):
+        """(value, expires_at) for an entry that is fresh or stale, else None."""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                row = self._db.execute(f"SELECT value, expires_at, stale_until FROM {self.table} WHERE key = ?",
+                                       (key,)).fetchone()
+                if row is not None:
+                    entry = (json.loads(row[0]), row[1], row[2])
+                    self._remember(key, entry)
+            if entry is None or entry[2] <= now:
+                if entry is not None:
+                    self.pop(key)
+                return None
+            self._entries.move_to_end(key)
+            with self._db:
+                self._db.execute(f"UPDATE {self.table} SET used_at = ? WHERE key = ?", (now, key))
+            return entry[0], entry[1]
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)  # Still on disk
+
+    def get(self, key, default=None, allow_stale=False):
+        found = self._lookup(key)
+        with self._lock:
+            if found is None or (found[1] <= self.clock() and not allow_stale):
+                self.misses += 1
+                return default
+            if found[1] <= self.clock():
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return found[0]
+
+    def put(self, key, value, ttl=None):
+        now = self.clock()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        entry = (value, expires_at, expires_at + self.stale_ttl)
+        with self._lock:
+            self._remember(key, entry)
+            with self._db:
+                self._db.execute(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?, ?)",
+                                 (key, json.dumps(value), entry[1], entry[2], now))
+            if len(self) > self.max_rows:
+                self.prune()
+
+    def fetch(self, key, loader, ttl=None, allow_stale=True):
+        """The cached value for key, calling loader() to fill a miss.
+
+        A stale value is returned as is while loader() refreshes it in the
+        background; with allow_stale=False a stale entry counts as a miss.
+        ttl may be a function of the loaded value. None is never cached.
+        """
+        found = self._lookup(key)
+        with self._lock:
+            if found is not None and found[1] > self.clock():
+                self.hits += 1
+                return found[0]
+            if found is not None and allow_stale:
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._refresh, args=(key, loader, ttl), daemon=True).start()
+                return found[0]
+            self.misses += 1
+        return self._load(key, loader, ttl)
+
+    def _load(self, key, loader, ttl):
+        value = loader()
+        if value is not None:
+            self.put(key, value, ttl(value) if callable(ttl) else ttl)
+        return value
+
+    def _refresh(self, key, loader, ttl):
+        try:
+            self._load(key, loader, ttl)
+            self.refreshes += 1
+        except Exception as e:
+            self.refresh_errors += 1
+            print(f"Background refresh of {key!r} failed, keeping the stale entry: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            with self._db:
+                self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            with self._db:
+                self._db.execute(f"DELETE FROM {self.table}")
+
+    def prune(self):
+        """Drop entries past their stale window, then the least recently used rows over max_rows."""
+        with self._lock, self._db:
+            self._db.execute(f"DELETE FROM {self.table} WHERE stale_until <= ?", (self.clock(),))
+            evicted = self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+                "ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.max_rows,)).rowcount
+            self.evictions += max(evicted, 0)
+            if evicted > 0:
+                keys = {row[0] for row in self._db.execute(f"SELECT key FROM {self.table}")}
+                for key in [key for key in self._entries if key not in keys]:
+                    del self._entries[key]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / total if total else 0.0
+
+    def stats(self):
+        return {"size": len(self), "hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses,
+                "refreshes": self.refreshes, "evictions": self.evictions, "hit_rate": self.hit_rate}
@@ -0,0 +1,194 @@
+import threading
+import numpy as np
+
+CAPTURE_SAMPLE_RATE = 16000
+CAPTURE_FRAME_LENGTH = 512  # Porcupine's frame length
+CAPTURE_BUFFER_SECONDS = 10
+READ_TIMEOUT = 0.1
+
+
+def pv_recorder(frame_length):
+    from pvrecorder import PvRecorder
+    return PvRecorder(device_index=-1, frame_length=frame_length)
+
+
+class AudioCapture:
+    """The microphone, opened once and recorded into a shared ring buffer.
+
+    One thread reads 16 kHz int16 frames from the recorder; any number of
+    CaptureReaders consume them at their own pace, each starting either at
+    the live position or up to buffer_seconds in the past. Positions are
+    absolute sample counts since the capture started.
+    recorder(frame_length) returns a PvRecorder-like object.
+    """
+
+    def __init__(self, sample_rate=CAPTURE_SAMPLE_RATE, frame_length=CAPTURE_FRAME_LENGTH,
+                 buffer_seconds=CAPTURE_BUFFER_SECONDS, recorder=pv_recorder):
+        self.sample_rate = sample_rate
+        self.frame_length = frame_length
+        self.capacity = int(sample_rate * buffer_seconds)
+        self.recorder = recorder
+        self.position = 0
+        self._buffer = np.zeros(self.capacity, dtype=np.int16)
+        self._cond = threading.Condition()
+        self._recorder = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._cond:
+            if self.running:
+                return
+            self._recorder = self.recorder(self.frame_length)
+            self._recorder.start()
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, args=(self._recorder,), daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._recorder is not None:
+            self._recorder.stop()
+            self._recorder.delete()
+            self._recorder = None
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def oldest_position(self):
+        """The earliest position the buffer still holds."""
+        return max(self.position - self.capacity, 0)
+
+    def reader(self, position=None):
+        return CaptureReader(self, self.position if position is None else position)
+
+    def seconds_to_samples(self, seconds):
+        return int(seconds * self.sample_rate)
+
+    def preroll_position(self, position, seconds):
+        """position moved seconds back, but no further back than the buffer still holds."""
+        return max(position - self.seconds_to_samples(seconds), self.oldest_position)
+
+    def _run(self, recorder):
+        try:
+            while not self._stopped.is_set():
+                self._append(np.asarray(recorder.read(), dtype=np.int16))
+        except Exception as e:
+            print(f"Microphone capture error: {e}")
+        finally:
+            with self._cond:
+                self._cond.notify_all()
+
+    def _append(self, frame):
+        with self._cond:
+            start = self.position % self.capacity
+            first = min(len(frame), self.capacity - start)
+            self._buffer[start:start + first] = frame[:first]
+            self._buffer[:len(frame) - first] = frame[first:]
+            self.position += len(frame)
+            self._cond.notify_all()
+
+    def _read(self, position, count, timeout):
+        """Copy count samples from position on; returns (samples, position) or (None, position)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.position >= position + count or not self.running, timeout):
+                return None, position
+            if self.position < position + count:
+                return None, position  # Capture stopped
+            skipped = max(0, self.position - self.capacity - position)
+            position += skipped  # The reader fell further behind than the buffer holds
+            count = min(count, self.position - position)
+            start = position % self.capacity
+            first = min(count, self.capacity - start)
+            samples = np.concatenate((self._buffer[start:start + first], self._buffer[:count - first]))
+            return samples, position + count
+
+
+class CaptureReader:
+    def __init__(self, capture, position):
+        self.capture = capture
+        self.position = max(position, capture.oldest_position)
+
+    def read(self, count, timeout=None):
+        """Block until count samples are available; None on timeout or when the capture stops."""
+        samples, self.position = self.capture._read(self.position, count, timeout)
+        return samples
+
+    def skip_to_live(self):
+        self.position = self.capture.position
+
+
+class CaptureStream:
+    """Sends captured audio to send(bytes) from its own thread, like deepgram.Microphone.
+
+    start() can begin in the past to send buffered pre-roll first. pause()
+    drops audio from the given position on, e.g. while Pixie is speaking,
+    and resume() continues from the live position. The device is never
+    closed or reopened.
+    """
+
+    def __init__(self, capture, send, chunk=1024):
+        self.capture = capture
+        self.send = send
+        self.chunk = chunk
+        self._lock = threading.Lock()
+        self._pause_at = None
+        self._skip_to_live = False
+        self._resumed = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.reader = None
+
+    def start(self, position=None):
+        self.reader = self.capture.reader(position)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+
+    def pause(self, at=None):
+        with self._lock:
+            self._pause_at = self.capture.position if at is None else at
+            self._resumed.clear()
+
+    def resume(self):
+        with self._lock:
+            self._pause_at = None
+            self._skip_to_live = True
+            self._resumed.set()
+
+    def is_active(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def finish(self):
+        self._stop.set()
+        self._resumed.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                if self._skip_to_live:
+                    self.reader.skip_to_live()
+                    self._skip_to_live = False
+                pause_at = self._pause_at
+            count = self.chunk
+            if pause_at is not None:
+                count = min(count, pause_at - self.reader.position)
+                if count <= 0:
+                    self._resumed.wait(READ_TIMEOUT)
+                    continue
+            samples = self.reader.read(count, READ_TIMEOUT)
+            if samples is not None:
+                self.send(samples.tobytes())
+            elif not self.capture.running:
+                return
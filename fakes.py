@@ -0,0 +1,484 @@
+"""In-process stand-ins for the cloud services, engines and audio devices, for benchmarks.
+
+Nothing here talks to a real service or audio device.
+"""
+import json
+import queue
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.server import serve
+
+CHARS_PER_SECOND = 15  # Rough speaking rate used to size fake audio
+
+
+def tone(seconds, sample_rate, frequency=220):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (np.sin(2 * np.pi * frequency * t) * 8000).astype(np.int16)
+
+
+class FakeClock:
+    """time.monotonic look-alike that only moves when told to."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeOrcaStream:
+    def __init__(self, engine):
+        self.engine = engine
+        self.started = False
+
+    def synthesize(self, text):
+        pcm = self.engine._render(text, first=not self.started)
+        self.started = True
+        return pcm
+
+    def flush(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class FakeOrca:
+    """pvorca engine look-alike that renders audio at a fixed real-time factor."""
+
+    def __init__(self, sample_rate=22050, rtf=0.1, startup=0.05):
+        self.sample_rate = sample_rate
+        self.rtf = rtf
+        self.startup = startup
+
+    def _render(self, text, first=False):
+        seconds = len(text) / CHARS_PER_SECOND
+        time.sleep(seconds * self.rtf + (self.startup if first else 0))
+        return tone(seconds, self.sample_rate).tolist()
+
+    def stream_open(self):
+        return FakeOrcaStream(self)
+
+    def synthesize(self, text):
+        return self._render(text, first=True), []
+
+    def delete(self):
+        pass
+
+
+class FakeDeepgramSpeakServer:
+    """Local websocket server speaking the Deepgram speak protocol.
+
+    Speak messages are rendered to linear16 frames at the configured
+    real-time factor; Flush is answered with Flushed once its audio is sent.
+    Clear stops the audio being sent, drops queued Speak messages and is
+    answered with Cleared.
+    """
+
+    def __init__(self, sample_rate=48000, rtf=0.1, first_audio_delay=0.15, frame_seconds=0.1):
+        self.sample_rate = sample_rate
+        self.rtf = rtf
+        self.first_audio_delay = first_audio_delay
+        self.frame_seconds = frame_seconds
+        self.connections = 0
+        self.clears = 0
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.socket.getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    @property
+    def http_url(self):
+        # Form accepted by DeepgramClientOptions(url=...)
+        return self.url.replace("ws://", "http://")
+
+    def start(self):
+        self._server = serve(self._handle, "127.0.0.1", 0)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+    def _handle(self, websocket):
+        self.connections += 1
+        requests = queue.Queue()
+        generation = [0]
+        renderer = threading.Thread(target=self._render, args=(websocket, requests, generation), daemon=True)
+        renderer.start()
+        try:
+            for message in websocket:
+                if isinstance(message, bytes):
+                    continue
+                request = json.loads(message)
+                if request.get("type") == "Clear":
+                    # Stop the text being rendered and drop everything queued behind it
+                    generation[0] += 1
+                    while True:
+                        try:
+                            requests.get_nowait()
+                        except queue.Empty:
+                            break
+                    self.clears += 1
+                if request.get("type") == "Close":
+                    return
+                requests.put(request)
+        finally:
+            requests.put(None)
+            renderer.join()
+
+    def _render(self, websocket, requests, generation):
+        flushes = 0
+        first = True
+        while (request := requests.get()) is not None:
+            if request.get("type") == "Speak":
+                if first:
+                    time.sleep(self.first_audio_delay)
+                    first = False
+                current = generation[0]
+                audio = tone(len(request["text"]) / CHARS_PER_SECOND, self.sample_rate)
+                frame = int(self.frame_seconds * self.sample_rate)
+                for start in range(0, len(audio), frame):
+                    time.sleep(self.frame_seconds * self.rtf)
+                    if generation[0] != current:
+                        break
+                    websocket.send(audio[start:start + frame].tobytes())
+            elif request.get("type") == "Flush":
+                websocket.send(json.dumps({"type": "Flushed", "sequence_id": flushes}))
+                flushes += 1
+                first = True
+            elif request.get("type") == "Clear":
+                websocket.send(json.dumps({"type": "Cleared", "sequence_id": flushes}))
+                first = True
+
+
+class FakeGroqServer:
+    """OpenAI-style chat completions endpoint, as called by the groq client.
+
+    Streaming requests get reply as server-sent events, one word per token,
+    after ttft and then every token_delay seconds. Requests for intent_model
+    get intent after intent_delay, streamed or not. A spike_rate fraction of
+    requests, picked by a seeded random generator, stall for another
+    spike_delay seconds first. Point the client at it with GROQ_BASE_URL.
+    """
+
+    def __init__(self, reply, intent="[NORMAL]", ttft=0.15, token_delay=0.02, intent_delay=0.1,
+                 intent_model="gemma2-9b-it", spike_rate=0.0, spike_delay=2.0, seed=0):
+        self.reply = reply
+        self.intent = intent
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.intent_delay = intent_delay
+        self.intent_model = intent_model
+        self.spike_rate = spike_rate
+        self.spike_delay = spike_delay
+        self.requests = 0
+        self.spikes = 0
+        self.cancelled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with fake._lock:
+                    fake.requests += 1
+                try:
+                    if body.get("stream"):
+                        fake._stream(self, body)
+                    else:
+                        fake._complete(self, body)
+                except (BrokenPipeError, ConnectionResetError):
+                    with fake._lock:
+                        fake.cancelled += 1  # The client closed a cancelled stream
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _spike(self):
+        with self._lock:
+            if self._random.random() >= self.spike_rate:
+                return 0.0
+            self.spikes += 1
+            return self.spike_delay
+
+    def tokens(self):
+        return [word + " " for word in self.reply.split()]
+
+    def _completion(self, body, **fields):
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            **fields,
+        }
+
+    def _complete(self, handler, body):
+        if body.get("model") == self.intent_model:
+            time.sleep(self.intent_delay + self._spike())
+            content = self.intent
+        else:
+            time.sleep(self.ttft + self._spike())
+            content = self.reply
+        response = self._completion(
+            body,
+            object="chat.completion",
+            choices=[{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        )
+        data = json.dumps(response).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _stream(self, handler, body):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.end_headers()
+        if body.get("model") == self.intent_model:
+            time.sleep(self.intent_delay + self._spike())
+            tokens = [self.intent]
+        else:
+            time.sleep(self.ttft + self._spike())
+            tokens = self.tokens()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_delay)
+            self._send_event(handler, self._chunk(body, {"content": token}, None))
+        self._send_event(handler, self._chunk(body, {}, "stop"))
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+
+    def _chunk(self, body, delta, finish_reason):
+        return self._completion(
+            body,
+            object="chat.completion.chunk",
+            choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        )
+
+    def _send_event(self, handler, event):
+        handler.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+        handler.wfile.flush()
+
+
+def transcript_result(text, is_final, speech_final=False, start=0.0, duration=1.0):
+    """A Deepgram live "Results" message."""
+    return json.dumps({
+        "type": "Results",
+        "channel_index": [0, 1],
+        "duration": duration,
+        "start": start,
+        "is_final": is_final,
+        "speech_final": speech_final,
+        "from_finalize": False,
+        "channel": {"alternatives": [{"transcript": text, "confidence": 0.99, "words": []}]},
+        "metadata": {
+            "request_id": "fake",
+            "model_info": {"name": "fake", "version": "1", "arch": "fake"},
+            "model_uuid": "fake",
+        },
+    })
+
+
+class FakeDeepgramTranscriptServer:
+    """Local websocket server speaking the Deepgram live transcription protocol.
+
+    Audio sent by the client is counted and dropped, as are KeepAlive
+    messages. say(text) replays an utterance to the connected client the
+    way Deepgram reports it: interim results growing one word every
+    word_delay seconds, then, final_delay seconds after the last word
+    (Deepgram's endpointing), a final result with speech_final set.
+    disconnect() closes the client's socket from the server side.
+    """
+
+    def __init__(self, word_delay=0.15, final_delay=None):
+        self.word_delay = word_delay
+        self.final_delay = word_delay if final_delay is None else final_delay
+        self.connections = 0
+        self.audio_bytes = 0
+        self.audio_received = threading.Event()
+        self.keepalives = 0
+        self.last_final_sent = None
+        self._websocket = None
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.socket.getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    @property
+    def http_url(self):
+        # Form accepted by DeepgramClientOptions(url=...)
+        return self.url.replace("ws://", "http://")
+
+    def start(self):
+        self._server = serve(self._handle, "127.0.0.1", 0)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+    def say(self, text):
+        websocket = self._websocket
+        if websocket is None:
+            raise RuntimeError("No transcription client is connected")
+        words = text.split()
+        for i in range(1, len(words) + 1):
+            time.sleep(self.word_delay if i > 1 else 0)
+            websocket.send(transcript_result(" ".join(words[:i]), False))
+        time.sleep(self.final_delay)
+        self.last_final_sent = time.monotonic()
+        websocket.send(transcript_result(text, True, speech_final=True))
+
+    def disconnect(self):
+        websocket = self._websocket
+        if websocket is not None:
+            websocket.close()
+
+    def _handle(self, websocket):
+        self.connections += 1
+        self._websocket = websocket
+        try:
+            for message in websocket:
+                if isinstance(message, bytes):
+                    self.audio_bytes += len(message)
+                    self.audio_received.set()
+                    continue
+                message_type = json.loads(message).get("type")
+                if message_type == "KeepAlive":
+                    self.keepalives += 1
+                elif message_type == "CloseStream":
+                    return
+        except ConnectionClosed:
+            pass
+        finally:
+            if self._websocket is websocket:
+                self._websocket = None
+
+
+class NullRecorder:
+    """pvrecorder.PvRecorder look-alike that records silence at real-time pace."""
+
+    def __init__(self, frame_length=512, sample_rate=16000):
+        self.frame_length = frame_length
+        self.sample_rate = sample_rate
+        self.is_recording = False
+        self._frame = [0] * frame_length
+        self._next = None
+
+    def start(self):
+        self.is_recording = True
+        self._next = time.monotonic()
+
+    def read(self):
+        self._next += self.frame_length / self.sample_rate
+        time.sleep(max(0.0, self._next - time.monotonic()))
+        return self._frame
+
+    def stop(self):
+        self.is_recording = False
+
+    def delete(self):
+        pass
+
+
+class FakeWikipedia:
+    """Stand-in for the wikipedia package: search(), page() and its two errors.
+
+    pages maps title -> summary; titles in disambiguations raise
+    DisambiguationError, unknown titles PageError. Each call sleeps delay
+    seconds, or delays[title] for page(title).
+    """
+
+    class DisambiguationError(Exception):
+        def __init__(self, title, may_refer_to=()):
+            super().__init__(f"{title} may refer to: {', '.join(may_refer_to)}")
+            self.title = title
+            self.options = list(may_refer_to)
+
+    class PageError(Exception):
+        pass
+
+    class Page:
+        def __init__(self, title, summary):
+            self.title = title
+            self.summary = summary
+
+    def __init__(self, pages, search_results=None, disambiguations=(), delay=0.05, delays=None):
+        self.pages = pages
+        self.search_results = search_results or {}
+        self.disambiguations = set(disambiguations)
+        self.delay = delay
+        self.delays = delays or {}
+        self.searches = 0
+        self.page_requests = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _call(self, seconds):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(seconds)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def search(self, query, results=10):
+        with self._lock:
+            self.searches += 1
+        self._call(self.delay)
+        if query in self.search_results:
+            return self.search_results[query][:results]
+        words = set(query.lower().split())
+        return [title for title in self.pages if words & set(title.lower().split())][:results]
+
+    def page(self, title):
+        with self._lock:
+            self.page_requests += 1
+        self._call(self.delays.get(title, self.delay))
+        if title in self.disambiguations:
+            raise self.DisambiguationError(title, [f"{title} (film)", f"{title} (band)"])
+        if title not in self.pages:
+            raise self.PageError(f"Page id {title!r} does not match any pages")
+        return self.Page(title, self.pages[title])
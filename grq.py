@@ -1,14 +1,27 @@
 import os
 from dotenv import load_dotenv
 from groq import Groq
+from intent import LocalIntentClassifier, normalize_utterance
+from cache import TTLCache
 
 # Load API key from .env file
 load_dotenv()
 api_key = os.getenv("GROQ_API_KEY")
 client = Groq(api_key=api_key)
+intent_classifier = LocalIntentClassifier(threshold=float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.85")))
+intent_cache = TTLCache(max_size=512, ttl=24 * 3600, path=os.getenv("INTENT_CACHE_PATH", "intent_cache.json") or None)
 
 # Function to query Groq API
 def get_query_type(user_query):
+    local_intent = intent_classifier.predict(user_query)
+    if local_intent is not None:
+        return local_intent
+
+    cache_key = normalize_utterance(user_query)
+    cached_intent = intent_cache.get(cache_key)
+    if cached_intent is not None:
+        return cached_intent
+
     intent = client.chat.completions.create(
         model="gemma2-9b-it",
         messages=[
@@ -58,9 +71,13 @@ General Behavior:
     )
 
     # Return the assistant's response
-    return intent.choices[0].message.content
+    intent_tags = intent.choices[0].message.content
+    intent_cache.put(cache_key, intent_tags)
+    return intent_tags
 
 
 user_query = input("Enter your query: ")
 response = get_query_type(user_query)
-print(response)
\ No newline at end of file
+print(response)
+print(f"Answered locally: {intent_classifier.local_hits > 0}, cache: {intent_cache.stats()}")
+intent_cache.save()
\ No newline at end of file
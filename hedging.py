@@ -0,0 +1,150 @@
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+import numpy as np
+
+HEDGE_PERCENTILE = 90
+HEDGE_MAX_RATE = 0.1  # At most this fraction of requests get a duplicate
+HEDGE_BURST = 2  # Duplicates that may be sent back to back after a quiet spell
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+
+
+def abort_stream(stream):
+    """Close a groq response stream now, even while another thread is blocked reading it.
+
+    Closing alone leaves a reader blocked in recv() until the server sends
+    something, so the socket is shut down first.
+    """
+    response = getattr(stream, "response", stream)
+    network_stream = getattr(response, "extensions", {}).get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    stream.close()
+
+
+class _Attempt:
+    def __init__(self):
+        self.handle = None
+        self.lost = False
+
+
+class Hedger:
+    """Sends a duplicate of a slow request and takes whichever answers first.
+
+    The duplicate goes out once the first request has run for longer than
+    the observed p90 latency (initial_delay until min_samples requests have
+    been seen, never less than min_delay). Duplicates are paid for from a
+    token bucket that earns max_rate tokens per request, so they stay under
+    max_rate of all requests over time. As soon as one request has answered,
+    the other one's handle is handed to discard(), e.g. to abort its stream,
+    so a stalled request doesn't keep a worker and a connection busy.
+    """
+
+    def __init__(self, name, initial_delay=1.0, min_delay=0.05, percentile=HEDGE_PERCENTILE, max_rate=HEDGE_MAX_RATE,
+                 burst=HEDGE_BURST, min_samples=HEDGE_MIN_SAMPLES, window=HEDGE_WINDOW, workers=4, clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.burst = burst
+        self.min_samples = min_samples
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"hedge-{name}")
+        self._latencies = deque(maxlen=window)
+        self._tokens = burst
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def delay(self):
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            return max(self.min_delay, float(np.percentile(self._latencies, self.percentile)))
+
+    def _allow_hedge(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self.hedges += 1
+            return True
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _attempt(self, attempt, request, finish, discard):
+        start = self.clock()
+        handle = request()
+        with self._lock:
+            attempt.handle = handle
+            lost = attempt.lost
+        if lost:
+            # The other request answered while this one was still opening
+            if discard is not None:
+                discard(handle)
+            raise CancelledError()
+        result = handle if finish is None else finish(handle)
+        self.observe(self.clock() - start)
+        return result
+
+    def _abandon(self, attempt, discard):
+        with self._lock:
+            attempt.lost = True
+            handle = attempt.handle
+        if handle is not None and discard is not None:
+            try:
+                discard(handle)
+            except Exception as e:
+                print(f"[hedge] {self.name}: discarding the slower request failed: {e}")
+
+    def call(self, request, finish=None, discard=None):
+        """finish(request()) -> result, hedged; request must be safe to run twice.
+
+        request() starts a request and returns a handle to it, e.g. a response
+        stream, as soon as it exists; finish(handle) waits for the result and
+        defaults to returning the handle itself.
+        """
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.burst, self._tokens + self.max_rate)
+        attempts = [_Attempt()]
+        first = self.executor.submit(self._attempt, attempts[0], request, finish, discard)
+        done, _ = wait([first], timeout=self.delay())
+        if done or not self._allow_hedge():
+            return first.result()
+
+        attempts.append(_Attempt())
+        second = self.executor.submit(self._attempt, attempts[1], request, finish, discard)
+        futures = [first, second]
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        winner = 0 if first in done else 1
+        if futures[winner].exception() is not None:
+            # A failed request doesn't win; fall back to the other one
+            winner = 1 - winner
+        else:
+            self._abandon(attempts[1 - winner], discard)
+        if winner == 1:
+            self.hedge_wins += 1
+        return futures[winner].result()
+
+    def stats(self):
+        with self._lock:
+            samples = list(self._latencies)
+        latency = dict(zip((50, 90, 99), np.percentile(samples, (50, 90, 99)) * 1000)) if samples else {}
+        return {"requests": self.requests, "hedges": self.hedges, "hedge_rate": self.hedges / max(self.requests, 1),
+                "hedge_wins": self.hedge_wins, "delay_ms": self.delay() * 1000,
+                **{f"p{p}_ms": round(value) for p, value in latency.items()}}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
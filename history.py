@@ -0,0 +1,90 @@
+import threading
+from collections import deque
+from queue import Queue, Empty
+
+CHARS_PER_TOKEN = 4  # Rough English average; close enough to budget a prompt
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    """Rough token count of text, rounded up; a chat message adds MESSAGE_OVERHEAD_TOKENS."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class ConversationHistory:
+    """Chat history bounded by an approximate token budget.
+
+    Turns that no longer fit are handed to a background thread which folds
+    them into a running summary with summarize(summary, messages).
+    """
+
+    def __init__(self, system_prompt, token_budget=1500, summarize=None):
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.summary = ""
+        self.tokens = 0
+        self._turns = deque()  # (user message, assistant message, tokens)
+        self._lock = threading.Lock()
+        self._evicted = Queue()
+        if summarize is not None:
+            threading.Thread(target=self._summarize_evicted, daemon=True).start()
+
+    def __len__(self):
+        return len(self._turns)
+
+    def add_turn(self, prompt, reply):
+        user = {"role": "user", "content": prompt}
+        assistant = {"role": "assistant", "content": reply}
+        tokens = estimate_tokens(prompt) + estimate_tokens(reply) + 2 * MESSAGE_OVERHEAD_TOKENS
+        with self._lock:
+            self._turns.append((user, assistant, tokens))
+            self.tokens += tokens
+            # Always keep the newest turn, even if it alone is over budget
+            while self.tokens > self.token_budget and len(self._turns) > 1:
+                old_user, old_assistant, old_tokens = self._turns.popleft()
+                self.tokens -= old_tokens
+                if self.summarize is not None:
+                    self._evicted.put([old_user, old_assistant])
+
+    def build_messages(self, prompt, context=None):
+        """Messages for the next request; bounded by the budget, not the session length.
+
+        context goes in as a system message just before the prompt and is not
+        kept in the history.
+        """
+        with self._lock:
+            messages = [self.system_message]
+            if self.summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+            for user, assistant, _ in self._turns:
+                messages.append(user)
+                messages.append(assistant)
+        if context:
+            messages.append({"role": "system", "content": context})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+            self.tokens = 0
+            self.summary = ""
+
+    def _summarize_evicted(self):
+        while True:
+            batch = self._evicted.get()
+            # Fold everything evicted so far into a single summary request
+            while True:
+                try:
+                    batch.extend(self._evicted.get_nowait())
+                except Empty:
+                    break
+            try:
+                summary = self.summarize(self.summary, batch)
+            except Exception as e:
+                print(f"An error occurred while summarizing history: {e}")
+                continue
+            if summary:
+                with self._lock:
+                    self.summary = summary
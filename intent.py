@@ -0,0 +1,146 @@
+import os
+import re
+import string
+import numpy as np
+
+EXAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_examples.tsv")
+CONFIDENCE_THRESHOLD = 0.85
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+# High precision keyword rules, checked before the model. They are anchored
+# to whole requests ("call for help", "what's the news"), not single words,
+# so "help me write a poem" or "I have some good news" are left to the
+# model. A rule match is treated as certain; several matches produce
+# several tags in query order.
+TOOL_RULES = [
+    ("SOS", re.compile(r"(^(please )?help( me)?( please)?$|^sos$|\b(call|get|send) (for )?help\b|"
+                       r"\b(this is|it's|it is) an emergency\b|^emergency\b|\bcall (an )?ambulance\b|"
+                       r"\bcall (the )?police\b|\bcall 911\b|\bi('m| am) (hurt|injured|bleeding)\b|"
+                       r"\bi('m| am) having a heart attack\b|\bi can't breathe\b)")),
+    ("GET_CAMERA", re.compile(r"\b(what (do|can) i see|what am i looking at|what('s| is) in front of me|"
+                              r"describe what you see|look at this)\b|^what('s| is) (this|that)$")),
+    ("GET_WEATHER", re.compile(r"\b(weather|forecast|will it (rain|snow)|is it (going to )?(rain|snow)(ing)?|"
+                               r"temperature outside|how (hot|cold) is it)\b")),
+    ("GET_NEWS", re.compile(r"\b(what('s| is) (the )?(latest )?news|(tell|give|read) me the (\w+ )?(news|headlines)|"
+                            r"any (breaking |new )?news|(latest|today's|top|breaking|morning) (news|headlines)|"
+                            r"the news (in|from|about|for|today)|headlines)\b")),
+    ("GET_EMAIL", re.compile(r"\b(e-?mails?|inbox|unread mail)\b")),
+]
+NORMAL_RULE = re.compile(r"^(hi|hello|hey|hey pixie|thanks|thank you|ok|okay|bye|goodbye|good night|"
+                         r"how are you|who are you|what's your name|what is your name)$")
+
+# A location is a run of words after a preposition, up to punctuation, a
+# conjunction or a time word: "in Paris and do I have..." gives "Paris".
+LOCATION_STOP_WORDS = (r"(?:and|or|but|so|then|today|tomorrow|tonight|now|right|this|next|later|on|in|at|for|"
+                       r"during|please|the (?:morning|afternoon|evening|night|week|weekend))")
+LOCATION_WORD = rf"(?!{LOCATION_STOP_WORDS}\b)[A-Za-z][A-Za-z.'-]*"
+LOCATION_RE = re.compile(rf"\b(?:in|at|for|near|around|from)\s+({LOCATION_WORD}(?:\s+{LOCATION_WORD})*)",
+                         re.IGNORECASE)
+NOT_LOCATIONS = {"me", "my area", "here", "a bit", "a while", "the day", "the week", "the weekend"}
+LOCATION_TAGS = {"GET_WEATHER", "GET_NEWS"}
+
+
+def normalize_utterance(text):
+    text = text.translate(str.maketrans('', '', string.punctuation))
+    return " ".join(text.strip().lower().split())
+
+
+def tokenize(text):
+    words = TOKEN_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def extract_location(text):
+    for match in LOCATION_RE.finditer(text):
+        location = match.group(1).strip(" .'-")
+        if location and location.lower() not in NOT_LOCATIONS:
+            return location
+    return "CURRENT"
+
+
+def format_tag(tag, text):
+    if tag in LOCATION_TAGS:
+        return f"[{tag}={extract_location(text)}]"
+    return f"[{tag}]"
+
+
+def load_examples(path):
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            tag, utterance = line.split("\t", 1)
+            examples.append((tag.strip(), utterance.strip()))
+    return examples
+
+
+class LocalIntentClassifier:
+    """Keyword rules plus a bag-of-words naive Bayes model over intent tags.
+
+    predict() returns the same tag strings as the INTENT_PROMPT model, or
+    None when the local confidence is below the threshold and the caller
+    should ask the LLM instead.
+    """
+
+    def __init__(self, examples_path=EXAMPLES_PATH, threshold=CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self.local_hits = 0
+        self.fallbacks = 0
+        self._train(load_examples(examples_path))
+
+    def _train(self, examples):
+        self.labels = sorted({tag for tag, _ in examples})
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        self.vocabulary = {}
+        rows, cols = [], []
+        for tag, utterance in examples:
+            for token in tokenize(utterance):
+                rows.append(label_index[tag])
+                cols.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+
+        counts = np.zeros((len(self.labels), len(self.vocabulary)), dtype=np.float64)
+        np.add.at(counts, (rows, cols), 1)
+        counts += 1  # Laplace smoothing
+        self.log_likelihood = np.log(counts / counts.sum(axis=1, keepdims=True))
+        priors = np.bincount([label_index[tag] for tag, _ in examples], minlength=len(self.labels))
+        self.log_prior = np.log(priors / priors.sum())
+
+    def classify(self, text):
+        """Return (tags, confidence) without applying the threshold."""
+        normalized = text.translate(str.maketrans('', '', '?!.,')).strip().lower()
+        if NORMAL_RULE.match(normalized):
+            return "[NORMAL]", 1.0
+
+        matches = {}
+        for tag, rule in TOOL_RULES:
+            match = rule.search(normalized)
+            if match:
+                matches[tag] = match.start()
+        if matches:
+            ordered = sorted(matches, key=matches.get)
+            return "".join(format_tag(tag, text) for tag in ordered), 1.0
+
+        indices = [self.vocabulary[t] for t in tokenize(text) if t in self.vocabulary]
+        if not indices:
+            return "[NORMAL]", 0.0
+        scores = self.log_prior + self.log_likelihood[:, indices].sum(axis=1)
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        best = int(np.argmax(probabilities))
+        return format_tag(self.labels[best], text), float(probabilities[best])
+
+    def predict(self, text):
+        tags, confidence = self.classify(text)
+        if confidence >= self.threshold:
+            self.local_hits += 1
+            return tags
+        self.fallbacks += 1
+        return None
+
+    @property
+    def hit_rate(self):
+        total = self.local_hits + self.fallbacks
+        return self.local_hits / total if total else 0.0
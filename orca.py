@@ -4,6 +4,7 @@ import numpy as np
 import time
 from queue import Queue, Empty
 import threading
+from audio_buffer import PCMRingBuffer, fill_ring
 
 ACCESS_KEY = ''
 orca = pvorca.create(access_key=ACCESS_KEY)
@@ -12,41 +13,51 @@ SAMPLE_RATE = 22050
 BUFFER_SIZE = 20  # Increased buffer size
 CHUNK_SIZE = 4096  # Larger chunk size for smoother playback
 MIN_AUDIO_LENGTH = CHUNK_SIZE * 2  # Minimum audio length before starting playback
+RING_BUFFER_SIZE = CHUNK_SIZE * 16
 
 audio_queue = Queue(maxsize=BUFFER_SIZE)
 stop_event = threading.Event()
+ring = PCMRingBuffer(RING_BUFFER_SIZE)
 
 def play_audio():
-    buffer = np.array([], dtype=np.int16)
-    while len(buffer) < MIN_AUDIO_LENGTH and not stop_event.is_set():
+    pending = None
+    finished = False
+    starved = False
+    # Prebuffer before opening the output device
+    while len(ring) < MIN_AUDIO_LENGTH and not finished and not stop_event.is_set():
         try:
-            pcm = audio_queue.get(timeout=0.1)
-            if isinstance(pcm, list):
-                audio_data = np.array(pcm, dtype=np.int16)
-            else:
-                audio_data = np.frombuffer(pcm, dtype=np.int16)
-            buffer = np.concatenate((buffer, audio_data))
+            pending, finished = fill_ring(ring, pending, audio_queue)
         except Empty:
             continue
+        if pending is not None:
+            break  # Ring is full
 
     with sd.OutputStream(samplerate=SAMPLE_RATE, channels=1, dtype='int16') as stream:
-        while not stop_event.is_set() or len(buffer) > 0:
-            if len(buffer) >= CHUNK_SIZE:
-                chunk = buffer[:CHUNK_SIZE]
-                buffer = buffer[CHUNK_SIZE:]
+        while True:
+            if len(ring) >= CHUNK_SIZE:
+                chunk = ring.peek(CHUNK_SIZE)
                 stream.write(chunk)
-            else:
-                try:
-                    pcm = audio_queue.get(timeout=0.1)
-                    if isinstance(pcm, list):
-                        audio_data = np.array(pcm, dtype=np.int16)
-                    else:
-                        audio_data = np.frombuffer(pcm, dtype=np.int16)
-                    buffer = np.concatenate((buffer, audio_data))
-                except Empty:
-                    if stop_event.is_set():
-                        break
-    
+                ring.consume(len(chunk))
+                starved = False
+                continue
+            if finished:
+                break
+            try:
+                pending, finished = fill_ring(ring, pending, audio_queue)
+            except Empty:
+                if stop_event.is_set():
+                    break
+                if len(ring) == 0 and not starved:
+                    ring.underruns += 1
+                    starved = True
+
+        # Play the tail that is shorter than a full chunk
+        while len(ring) > 0:
+            chunk = ring.peek(len(ring))
+            stream.write(chunk)
+            ring.consume(len(chunk))
+    print(f"Playback done: {ring.underruns} underruns, high-water mark {ring.high_water} samples")
+
 def stream_synthesis(text_generator):
     print("Starting stream synthesis")
     stream = orca.stream_open()
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import numpy as np
+
+
+class PCMCache:
+    """Pre-synthesized speech stored as raw int16 files.
+
+    Entries are keyed by (text, voice, sample rate) and read back through
+    np.memmap, so cached audio can be written to the output stream without
+    loading or copying it first.
+    """
+
+    def __init__(self, directory, voice="default", sample_rate=22050):
+        self.directory = directory
+        self.voice = voice
+        self.sample_rate = sample_rate
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, text):
+        normalized = " ".join(text.split())
+        digest = hashlib.sha1(f"{self.voice}|{self.sample_rate}|{normalized}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.pcm")
+
+    def get(self, text):
+        path = self.path(text)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return np.memmap(path, dtype=np.int16, mode='r')
+
+    def put(self, text, pcm):
+        path = self.path(text)
+        tmp_path = f"{path}.tmp"
+        np.asarray(pcm, dtype=np.int16).tofile(tmp_path)
+        os.replace(tmp_path, path)
+        return np.memmap(path, dtype=np.int16, mode='r')
+
+    def prewarm(self, phrases, synthesize):
+        """Synthesize and store every phrase that is not cached yet."""
+        for phrase in phrases:
+            if not os.path.exists(self.path(phrase)):
+                self.put(phrase, synthesize(phrase))
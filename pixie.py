@@ -1,48 +1,117 @@
 import groq
 import os
-import pvorca
-import sounddevice as sd
 import pvporcupine
-from pvrecorder import PvRecorder
-import numpy as np
-from queue import Queue, Empty
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from deepgram import (
-    DeepgramClient,
-    DeepgramClientOptions,
-    LiveTranscriptionEvents,
-    LiveOptions,
-    Microphone,
-)
+from deepgram import LiveOptions
 import sys
 import shutil
 import time
-import string
 import re
+from itertools import chain
+from audio_output import shared_output
+from capture import AudioCapture, CaptureStream
+from intent import LocalIntentClassifier, normalize_utterance
+from cache import TTLCache
+from history import ConversationHistory
+from stt_connection import STTConnectionManager
+from timers import DeadlineTimer
+from vad import BargeInMonitor, EnergyVAD, VADGate
+from stt_encoding import EncodingSender, create_encoder
+from tts_backends import OrcaBackend, create_backend
+from tts_manager import TTSManager
+from tracing import Tracer
+from tools import ToolDispatcher, parse_tags, tool_context
+from speculation import SpeculativePrefetch
+from hedging import Hedger, abort_stream
 
 load_dotenv()
 
 # Constants
-SAMPLE_RATE = 22050
-BUFFER_SIZE = 20
-CHUNK_SIZE = 1024
-MIN_AUDIO_LENGTH = CHUNK_SIZE * 1
-MAX_HISTORY = 50
+TTS_BACKEND = os.getenv("TTS_BACKEND", OrcaBackend.name)  # orca, deepgram or deepgram-sdk
+GREETING = "Hey! What can I do for you?"
+PREWARM_PHRASES = [GREETING]
+HISTORY_TOKEN_BUDGET = 1500
+SUMMARY_MAX_TOKENS = 150
+STREAM_TTS = True
+CLAUSE_MIN_LENGTH = 40
+UTTERANCE_TIMEOUT = float(os.getenv("UTTERANCE_TIMEOUT", "2"))
+BARGE_IN = os.getenv("BARGE_IN", "0") == "1"
+BARGE_IN_THRESHOLD = float(os.getenv("BARGE_IN_THRESHOLD", "1500"))  # RMS; above the speaker echo level
+BARGE_IN_FRAMES = 3
+BARGE_IN_PREROLL_FRAMES = 8
+MIC_CHUNK = 1024  # 64 ms at 16 kHz, small enough to react to barge-in quickly
+CAPTURE_BUFFER_SECONDS = 10
+STT_PREROLL_MS = float(os.getenv("STT_PREROLL_MS", "0"))  # Audio from before the end of the wake word that is sent to STT
+STT_ENCODING = os.getenv("STT_ENCODING", "linear16")  # linear16, mulaw (half the bytes) or opus (needs opuslib)
+VAD_GATE = os.getenv("VAD_GATE", "1") == "1"  # Only stream audio around speech to Deepgram
+VAD_THRESHOLD = float(os.getenv("VAD_THRESHOLD", "300"))  # RMS; below the barge-in threshold so quiet speech gets through
+VAD_HANGOVER = 1.0  # Seconds of silence still streamed after speech, so Deepgram's endpointing can fire
+LOCAL_END_OF_UTTERANCE = float(os.getenv("LOCAL_END_OF_UTTERANCE", "0.7"))  # Seconds of silence before asking Deepgram to finalize
+TRACE_PATH = os.getenv("TRACE_PATH", "")  # JSONL file for per-turn latency spans; empty disables tracing
+DEFAULT_LOCATION = os.getenv("DEFAULT_LOCATION", "")  # Where [GET_WEATHER=CURRENT] looks; empty skips the lookup
+WEATHER_TOOL_TIMEOUT = float(os.getenv("WEATHER_TOOL_TIMEOUT", "6"))
+WIKI_TOOL_TIMEOUT = float(os.getenv("WIKI_TOOL_TIMEOUT", "3.5"))
+TOOL_SUMMARY_CHARS = 600
+SPECULATE = os.getenv("SPECULATE", "0") == "1"  # Classify and prefetch tools on stable interim transcripts
+SPECULATION_STABLE_MS = float(os.getenv("SPECULATION_STABLE_MS", "300"))  # How long an interim must stay unchanged
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "0") == "1"  # Duplicate Groq requests that run past their p90 latency
+HEDGE_MAX_RATE = float(os.getenv("HEDGE_MAX_RATE", "0.1"))  # Upper bound on duplicates per request
 
 # Global variables
 current_sentence = ""
 displayed_sentence = ""
-last_update_time = time.time()
+utterance_start = None
 microphone = None
-conversation_history = []
+stt_gate = None
+stt_sender = None
+stt_sender_connection = None
+wake_position = None
+turn_open = False  # A traced turn has begun and its utterance isn't final yet
+barge_in = None
+active_reply = None
 exit_flag = threading.Event()
 processing_lock = threading.Lock()
+turn_executor = ThreadPoolExecutor(max_workers=2)
+weather_scraper = None
+weather_scraper_lock = threading.Lock()
+wiki_lookup = None
+wiki_lookup_lock = threading.Lock()
+tracer = Tracer(TRACE_PATH or None)
 
 # API clients
 client = groq.Groq(api_key=os.getenv("GROQ_API_KEY"))
 SYSTEM_PROMPT = os.getenv("GROQ_SYSTEM_PROMPT")
 INTENT_PROMPT = os.getenv("INTENT_PROMPT")
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.85"))
+intent_classifier = LocalIntentClassifier(threshold=INTENT_CONFIDENCE_THRESHOLD)
+INTENT_CACHE_SIZE = 512
+INTENT_CACHE_TTL = 24 * 3600
+INTENT_CACHE_PATH = os.getenv("INTENT_CACHE_PATH", "intent_cache.json")
+intent_cache = TTLCache(max_size=INTENT_CACHE_SIZE, ttl=INTENT_CACHE_TTL, path=INTENT_CACHE_PATH or None)
+# Hedging waits for the first token of a streamed answer, or for the whole intent response
+llm_hedger = Hedger("llm", initial_delay=1.0, max_rate=HEDGE_MAX_RATE) if HEDGE_REQUESTS else None
+intent_hedger = Hedger("intent", initial_delay=0.8, max_rate=HEDGE_MAX_RATE) if HEDGE_REQUESTS else None
+
+DEEPGRAM_URL = os.getenv("DEEPGRAM_URL", "")  # Empty means api.deepgram.com
+# Fail early on an unknown encoding; opus falls back to linear16 without opuslib
+stt_encoder = create_encoder(STT_ENCODING)
+STT_ENCODING = "linear16" if stt_encoder is None else stt_encoder.encoding
+LIVE_OPTIONS = LiveOptions(
+    model="nova-2",
+    language="en-US",
+    punctuate=True,
+    encoding=STT_ENCODING,
+    channels=1,
+    sample_rate=16000,
+    interim_results=True,
+    utterance_end_ms="1000",
+    vad_events=True,
+    endpointing=300,
+    no_delay=True,
+)
+stt_manager = STTConnectionManager(LIVE_OPTIONS, url=DEEPGRAM_URL)
 
 porcupine_access_key = os.getenv('PICOVOICE_ACCESS_KEY')
 if not porcupine_access_key:
@@ -51,131 +120,118 @@ if not porcupine_access_key:
 
 wakeword_path = "pixy_windows.ppn"  # Replace with your .ppn file path
 sensitivity = 1
-
-class TTSManager:
-    def __init__(self, access_key):
-        self.access_key = access_key
-        self.orca = pvorca.create(access_key=access_key)
-        self.text_queue = Queue()
-        self.audio_queue = Queue(maxsize=BUFFER_SIZE)
-        self.stop_event = threading.Event()
-        self.synthesis_thread = None
-        self.playback_thread = None
-
-    def synthesize_speech(self):
-        stream = self.orca.stream_open()
-        while not self.stop_event.is_set():
-            try:
-                text_chunk = self.text_queue.get(timeout=0.1)
-                if text_chunk is None:
-                    break
-                pcm = stream.synthesize(text_chunk)
-                if pcm is not None:
-                    self.audio_queue.put(pcm)
-            except Empty:
-                continue
-
-        pcm = stream.flush()
-        if pcm is not None:
-            self.audio_queue.put(pcm)
-        stream.close()
-        self.audio_queue.put(None)  # Signal end of audio synthesis
-
-    def play_audio(self):
-        buffer = np.array([], dtype=np.int16)
-        with sd.OutputStream(samplerate=SAMPLE_RATE, channels=1, dtype='int16') as stream:
-            while not self.stop_event.is_set():
-                while len(buffer) < MIN_AUDIO_LENGTH:
-                    try:
-                        pcm = self.audio_queue.get(timeout=0.1)
-                        if pcm is None:  # End of audio
-                            self.stop_event.set()
-                            break
-                        if isinstance(pcm, list):
-                            audio_data = np.array(pcm, dtype=np.int16)
-                        else:
-                            audio_data = np.frombuffer(pcm, dtype=np.int16)
-                        buffer = np.concatenate((buffer, audio_data))
-                    except Empty:
-                        if self.stop_event.is_set():
-                            break
-
-                if len(buffer) >= CHUNK_SIZE:
-                    chunk = buffer[:CHUNK_SIZE]
-                    buffer = buffer[CHUNK_SIZE:]
-                    stream.write(chunk)
-
-    def speak(self, text):
-        self.stop_event.clear()
-        self.text_queue.put(text)
-        self.text_queue.put(None)  # Signal end of text
-
-        if self.synthesis_thread is None or not self.synthesis_thread.is_alive():
-            self.synthesis_thread = threading.Thread(target=self.synthesize_speech)
-            self.synthesis_thread.start()
-
-        if self.playback_thread is None or not self.playback_thread.is_alive():
-            self.playback_thread = threading.Thread(target=self.play_audio)
-            self.playback_thread.start()
-
-    def wait_for_completion(self):
-        if self.synthesis_thread:
-            self.synthesis_thread.join()
-        if self.playback_thread:
-            self.playback_thread.join()
-
-    def cleanup(self):
-        self.stop_event.set()
-        self.wait_for_completion()
-        if self.orca:
-            self.orca.delete()
-            self.orca = None
-
-    def reset(self):
-        self.cleanup()
-        self.orca = pvorca.create(access_key=self.access_key)
-        self.text_queue = Queue()
-        self.audio_queue = Queue(maxsize=BUFFER_SIZE)
-        self.stop_event.clear()
-        self.synthesis_thread = None
-        self.playback_thread = None
+capture = AudioCapture(buffer_seconds=CAPTURE_BUFFER_SECONDS)  # One microphone stream for the wake word and STT
+
+class SentenceChunker:
+    """Cuts streamed LLM tokens into sentence/clause sized pieces for Orca."""
+    SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+    CLAUSE_END = re.compile(r'[,;:]\s+')
+
+    def __init__(self, min_clause_length=CLAUSE_MIN_LENGTH):
+        self.min_clause_length = min_clause_length
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        chunks = []
+        while True:
+            match = self.SENTENCE_END.search(self.buffer)
+            if match is None and len(self.buffer) >= self.min_clause_length:
+                # No sentence end yet; fall back to the last clause boundary
+                for match in self.CLAUSE_END.finditer(self.buffer):
+                    pass
+            if match is None:
+                break
+            chunks.append(self.buffer[:match.end()])
+            self.buffer = self.buffer[match.end():]
+        return chunks
+
+    def flush(self):
+        text, self.buffer = self.buffer, ""
+        return text if text.strip() else None
 
 # Create TTS manager
-tts_manager = TTSManager(os.getenv("PICOVOICE_ACCESS_KEY"))
+def create_tts_backend():
+    if TTS_BACKEND == OrcaBackend.name:
+        return create_backend(TTS_BACKEND, access_key=os.getenv("PICOVOICE_ACCESS_KEY"))
+    return create_backend(TTS_BACKEND)
+
+audio_output = shared_output()  # One device stream for the whole process; AUDIO_OUTPUT=null for headless runs
+tts_manager = TTSManager(create_tts_backend, output=audio_output, tracer=tracer)
 
 def should_end_conversation(text):
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    text = text.strip().lower()
+    text = normalize_utterance(text)
     return re.search(r'\b(goodbye|bye)\b$', text) is not None
 
-def generate_text(prompt, store_in_history=True, max_tokens=100):
-    try:
-        if not conversation_history or conversation_history[0]["role"] != "system":
-            conversation_history.insert(0, {"role": "system", "content": SYSTEM_PROMPT})
-        
-        temp_conversation = conversation_history.copy()
-        temp_conversation.append({"role": "user", "content": prompt})
-        
-        stream = client.chat.completions.create(
+def summarize_history(summary, messages):
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    response = client.chat.completions.create(
+        model="llama-3.1-8b-instant",
+        messages=[
+            {
+                "role": "system",
+                "content": "Update the running summary of a conversation between a user and a voice assistant. "
+                           "Keep names, facts and open requests. Reply with the summary only, under 100 words."
+            },
+            {
+                "role": "user",
+                "content": f"Current summary:\n{summary or '(none)'}\n\nOlder turns to fold in:\n{transcript}"
+            }
+        ],
+        temperature=0,
+        max_tokens=SUMMARY_MAX_TOKENS,
+        stream=False,
+    )
+    return response.choices[0].message.content.strip()
+
+conversation_history = ConversationHistory(SYSTEM_PROMPT, HISTORY_TOKEN_BUDGET, summarize=summarize_history)
+
+def generate_text(prompt, store_in_history=True, max_tokens=100, on_text=None, cancel_event=None, context=None):
+    def open_stream():
+        return client.chat.completions.create(
             model="llama-3.1-8b-instant",
-            messages=temp_conversation,
+            messages=messages,
             max_tokens=max_tokens,
             stream=True
         )
 
-        ai_response = ""
+    def first_token(stream):
+        # Read up to the first token so a hedged request is decided by time to first token
+        head = []
         for chunk in stream:
+            head.append(chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                break
+        return stream, head
+
+    try:
+        request_start = tracer.now()
+        messages = conversation_history.build_messages(prompt, context)
+        if llm_hedger is not None:
+            stream, head = llm_hedger.call(open_stream, first_token, discard=abort_stream)
+        else:
+            stream, head = first_token(open_stream())
+        tracer.record("llm_ttft", request_start)
+
+        ai_response = ""
+        for chunk in chain(head, stream):
+            if cancel_event is not None and cancel_event.is_set():
+                stream.close()
+                print(" [cancelled]\n")
+                return None
             if chunk.choices[0].delta.content is not None:
                 text_chunk = chunk.choices[0].delta.content
+                if not ai_response:
+                    tracer.mark("llm_first_token")
                 ai_response += text_chunk
                 print(text_chunk, end='', flush=True)
+                if on_text:
+                    on_text(text_chunk)
 
+        tracer.mark("llm_last_token")
+        tracer.record("llm", request_start)
         if store_in_history:
-            conversation_history.append({"role": "user", "content": prompt})
-            conversation_history.append({"role": "assistant", "content": ai_response})
-            if len(conversation_history) > MAX_HISTORY:
-                conversation_history.pop(1)
-                conversation_history.pop(1)
+            conversation_history.add_turn(prompt, ai_response)
         
         print("\n")
         return ai_response
@@ -184,41 +240,165 @@ def generate_text(prompt, store_in_history=True, max_tokens=100):
         return None
 
 def get_query_type(user_query):
-    intent = client.chat.completions.create(
-        model="gemma2-9b-it",
-        messages=[
-            {
-                "role": "system",
-                "content": INTENT_PROMPT
-            },
-            {
-                "role": "user",
-                "content": user_query
-            }
-        ],
-        temperature=0,
-        max_tokens=80,
-        top_p=1,
-        stream=False,
-        stop=None,
-    )
+    return classify_query(user_query)[0]
+
+def classify_query(user_query):
+    """(intent tags, where they came from: "local", "cache" or "llm")."""
+    with tracer.span("intent"):
+        # Common tags are decided locally; only low confidence queries hit the LLM
+        local_intent = intent_classifier.predict(user_query)
+        if local_intent is not None:
+            return local_intent, "local"
+
+        cache_key = normalize_utterance(user_query)
+        cached_intent = intent_cache.get(cache_key)
+        if cached_intent is not None:
+            return cached_intent, "cache"
+
+        def request():
+            # Streamed so a hedged duplicate can be aborted before the intent has arrived
+            return client.chat.completions.create(
+                model="gemma2-9b-it",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": INTENT_PROMPT
+                    },
+                    {
+                        "role": "user",
+                        "content": user_query
+                    }
+                ],
+                temperature=0,
+                max_tokens=80,
+                top_p=1,
+                stream=True,
+                stop=None,
+            )
+
+        def read(stream):
+            return "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+
+        if intent_hedger is not None:
+            intent_tags = intent_hedger.call(request, read, discard=abort_stream)
+        else:
+            intent_tags = read(request())
+
+        # Return the assistant's response
+        intent_cache.put(cache_key, intent_tags)
+        return intent_tags, "llm"
+
+class StreamingAnswer:
+    """One generate_text reply fed to the TTS sentence by sentence.
+
+    Text is held back until commit(), so the reply can be started before the
+    intent is known; cancel() closes the Groq stream without speaking.
+    """
+
+    def __init__(self, prompt, store_in_history=True, context=None):
+        self.prompt = prompt
+        self.store_in_history = store_in_history
+        self.context = context
+        self.chunker = SentenceChunker()
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.held = []
+        self.committed = False
+        self.text = None
+        self.duration = None
+
+    def run(self):
+        start = time.perf_counter()
+        on_text = self.on_text if STREAM_TTS else None
+        # History is only updated once the reply is actually spoken
+        self.text = generate_text(self.prompt, False, on_text=on_text, cancel_event=self.cancel_event,
+                                  context=self.context)
+        self.duration = time.perf_counter() - start
+        return self.text
+
+    def on_text(self, text_chunk):
+        with self.lock:
+            if self.cancel_event.is_set():
+                return
+            sentences = self.chunker.feed(text_chunk)
+            if self.committed:
+                for sentence in sentences:
+                    tts_manager.feed(sentence)
+            else:
+                self.held.extend(sentences)
+
+    def commit(self):
+        global active_reply
+        active_reply = self
+        with self.lock:
+            self.committed = True
+            if STREAM_TTS:
+                # Feed Orca as the tokens arrive instead of waiting for the full reply
+                tts_manager.start_stream()
+                for sentence in self.held:
+                    tts_manager.feed(sentence)
+                self.held = []
+
+    def cancel(self):
+        with self.lock:
+            self.cancel_event.set()
+
+    def finish(self):
+        # Called once run() has returned
+        global active_reply
+        if self.cancel_event.is_set():
+            pass  # Interrupted; the TTS queues were already drained
+        elif STREAM_TTS:
+            tail = self.chunker.flush()
+            if tail:
+                tts_manager.feed(tail)
+            tts_manager.end_stream()
+        elif self.text:
+            tts_manager.speak(self.text)
+        if self.store_in_history and self.text is not None:
+            conversation_history.add_turn(self.prompt, self.text)
+        tts_manager.wait_for_completion()
+        if active_reply is self:
+            active_reply = None
 
-    # Return the assistant's response
-    return intent.choices[0].message.content
+def interrupt_answer():
+    # Called on the microphone callback thread, so it only signals and drains
+    start = time.perf_counter()
+    reply = active_reply
+    if reply is not None:
+        reply.cancel()
+    tts_manager.interrupt()
 
-def answer(prompt, store_in_history=True):
-    global microphone
-    if microphone:
-        microphone.finish()
+    def report():
+        tts_manager.wait_for_completion(timeout=1)
+        print(f"\n[barge-in] speech stopped in {(time.perf_counter() - start) * 1000:.0f} ms")
 
-    generated_text = generate_text(prompt, store_in_history)
+    threading.Thread(target=report, daemon=True).start()
 
-    if generated_text:
-        tts_manager.speak(generated_text)
-        tts_manager.wait_for_completion()
+def pause_listening():
+    # With barge-in the audio keeps flowing and is watched for user speech instead
+    if barge_in is not None:
+        barge_in.arm()
+    elif microphone:
+        microphone.pause()
 
-    if microphone:
-        microphone.start()
+def resume_listening():
+    if stt_gate is not None:
+        stt_gate.reset()
+    if barge_in is not None:
+        barge_in.disarm()
+    elif microphone:
+        microphone.resume()
+
+def answer(prompt, store_in_history=True, context=None):
+    pause_listening()
+
+    reply = StreamingAnswer(prompt, store_in_history, context)
+    reply.commit()
+    reply.run()
+    reply.finish()
+
+    resume_listening()
 
 
 
@@ -233,140 +413,361 @@ def display_sentence(sentence, end="\n"):
     print(f"\rUSER: {sentence}", end=end, flush=True)
     displayed_sentence = sentence
 
-def check_timeout():
-    global current_sentence, last_update_time
-    while not exit_flag.is_set():
-        time.sleep(0.01)
-        with processing_lock:
-            if current_sentence and time.time() - last_update_time > 2:
-                display_sentence(current_sentence)
-                process(current_sentence, False)
-                current_sentence = ""
-                last_update_time = time.time()
+def end_utterance(is_final):
+    # Called with processing_lock held
+    global current_sentence, utterance_start, turn_open
+    tracer.mark("stt_final")
+    tracer.record("stt_utterance", utterance_start)  # First transcript to final
+    turn_open = False
+    display_sentence(current_sentence)
+    process(current_sentence, is_final)
+    current_sentence = ""
+    utterance_start = None
+
+def on_utterance_timeout():
+    # No transcript update for UTTERANCE_TIMEOUT seconds: treat the pending sentence as final
+    with processing_lock:
+        if current_sentence:
+            end_utterance(False)
+
+utterance_timer = DeadlineTimer(UTTERANCE_TIMEOUT, on_utterance_timeout)
+
+def get_weather_scraper(timeout=None):
+    """The shared WebKit scraper, launched on first use; None if it is still launching after timeout seconds."""
+    global weather_scraper
+    if not weather_scraper_lock.acquire(timeout=-1 if timeout is None else timeout):
+        return None
+    try:
+        if weather_scraper is None:
+            from scraper import PlaywrightWebKitScraper
+            weather_scraper = PlaywrightWebKitScraper()
+        return weather_scraper
+    finally:
+        weather_scraper_lock.release()
+
+def prewarm_weather_scraper():
+    # Launching WebKit takes seconds; doing it inside the tool deadline would time out the first query
+    def launch():
+        try:
+            get_weather_scraper()
+        except Exception as e:
+            print(f"Could not launch the weather scraper: {e}")
+    threading.Thread(target=launch, daemon=True).start()
+
+def weather_tool(location, query, timeout):
+    import weather_context
+    if not location or location == "CURRENT":
+        location = DEFAULT_LOCATION
+    if not location:
+        return None
+    end = time.monotonic() + timeout
+    scraper = get_weather_scraper(timeout)
+    if scraper is None:
+        print("[tools] the weather scraper is still launching")
+        return None
+    report = weather_context.weather_report(scraper, location, timeout=max(end - time.monotonic(), 0))
+    return None if "[NO_INFO]" in report else f"Weather in {location}:\n{report}"
+
+def wiki_tool(arg, query, timeout):
+    global wiki_lookup
+    with wiki_lookup_lock:
+        if wiki_lookup is None:
+            from wiki import WikipediaLookup
+            wiki_lookup = WikipediaLookup()
+    results = wiki_lookup.lookup(arg or query, deadline=timeout)
+    return "\n".join(f"{title}: {summary[:TOOL_SUMMARY_CHARS]}" for title, summary in results[:2])
+
+# Tags without a tool here (SOS, GET_CAMERA, GET_NEWS, GET_EMAIL) are answered by the LLM alone
+tool_dispatcher = ToolDispatcher()
+tool_dispatcher.register("GET_WEATHER", weather_tool, timeout=WEATHER_TOOL_TIMEOUT)
+tool_dispatcher.register("WEB_SEARCH", wiki_tool, timeout=WIKI_TOOL_TIMEOUT)
+
+def tool_tags(response):
+    # Only tags with a registered tool are worth prefetching
+    return [tag for tag in parse_tags(response) if tag[0] in tool_dispatcher.tools]
+
+speculator = SpeculativePrefetch(classify_query, tool_tags, tool_dispatcher.run,
+                                 stable_seconds=SPECULATION_STABLE_MS / 1000) if SPECULATE else None
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
 
 def process(sentence, is_final):
-    response = get_query_type(sentence)
+    turn_start = time.perf_counter()
+
+    # Classify and answer in parallel; the answer is only spoken for [NORMAL]
+    reply = StreamingAnswer(sentence)
+    speculation = speculator.take(sentence) if speculator is not None else None
+    if speculation is not None:
+        intent_future = speculation.intent  # Started on the interim transcript
+    else:
+        intent_future = turn_executor.submit(timed, get_query_type, sentence)
+    reply_future = turn_executor.submit(reply.run)
+    try:
+        response, intent_time = intent_future.result()
+    except Exception:
+        reply.cancel()
+        raise
     print(response)
-    answer(sentence)
+    tags = parse_tags(response)
+
+    # With no tool to run, the speculative answer is the answer
+    if response.strip() == "[NORMAL]" or not tool_dispatcher.handles(tags):
+        pause_listening()
+        reply.commit()
+        reply_future.result()
+        parallel_time = time.perf_counter() - turn_start
+        reply.finish()
+        resume_listening()
+        serial_time = intent_time + (reply.duration or 0)
+        print(f"[turn] intent {intent_time:.2f}s, answer {reply.duration or 0:.2f}s, "
+              f"parallel {parallel_time:.2f}s (saved {serial_time - parallel_time:.2f}s), "
+              f"total {time.perf_counter() - turn_start:.2f}s")
+    else:
+        # A tool is needed, so the speculative answer is dropped
+        reply.cancel()
+        tools_start = time.perf_counter()
+        with tracer.span("tools"):
+            results = speculation.tools.result() if speculation is not None else None
+            if results is None:
+                results = tool_dispatcher.run(tags, sentence)
+        tools_time = time.perf_counter() - tools_start
+        reply_future.result()
+        answer(sentence, context=tool_context(results))
+        print(f"[turn] intent {intent_time:.2f}s, tools {tools_time:.2f}s ({len(results)} of {len(tags)} tags), "
+              f"total {time.perf_counter() - turn_start:.2f}s")
+
     if should_end_conversation(sentence):
         exit_flag.set()
 
+def stt_sender_for(connection):
+    # An Ogg Opus stream starts with its headers once per websocket, so the encoder lives as long as the connection
+    global stt_sender, stt_sender_connection
+    if stt_sender is None or stt_sender_connection is not connection:
+        if stt_sender is not None:
+            stt_sender.close()
+        stt_sender = EncodingSender(connection.send, create_encoder(STT_ENCODING))
+        stt_sender_connection = connection
+    return stt_sender
+
 def speech2speech():
-    global microphone, dg_connection, exit_flag, current_sentence, last_update_time, displayed_sentence
+    global microphone, stt_gate, barge_in, exit_flag, current_sentence, displayed_sentence, utterance_start, turn_open
     try:
-        config = DeepgramClientOptions(options={"keepalive": "true"})
-        deepgram: DeepgramClient = DeepgramClient("", config)
-
-        dg_connection = deepgram.listen.websocket.v("1")
-
         def on_message(self, result, **kwargs):
-            global current_sentence, last_update_time, displayed_sentence
+            global current_sentence, displayed_sentence, utterance_start, turn_open
             transcript = result.channel.alternatives[0].transcript
-            if len(transcript) == 0:
+            # A Finalize sent on local end of utterance comes back as from_finalize, possibly empty
+            finalized = result.is_final and (result.speech_final or result.from_finalize)
+            if len(transcript) == 0 and not (finalized and current_sentence):
                 return
 
             with processing_lock:
+                if utterance_start is None:
+                    utterance_start = tracer.now()
+                    if not turn_open:
+                        # The first turn began at the wake word; later ones begin when the user starts talking
+                        tracer.begin_turn("speech")
+                        turn_open = True
+                    tracer.mark("first_interim")
                 if result.is_final:
                     current_sentence += transcript
-                    if result.speech_final:
-                        display_sentence(current_sentence)
-                        process(current_sentence, True)
-                        current_sentence = ""
+                    if finalized and current_sentence:
+                        end_utterance(True)
                     else:
                         display_sentence(current_sentence, end="")
+                        if speculator is not None:
+                            speculator.update(current_sentence)
                 else:
                     temp_sentence = current_sentence + transcript
                     if temp_sentence != displayed_sentence:
                         display_sentence(temp_sentence, end="")
+                    if speculator is not None:
+                        speculator.update(temp_sentence)
 
-                last_update_time = time.time()
-
-        dg_connection.on(LiveTranscriptionEvents.Transcript, on_message)
-
-        options: LiveOptions = LiveOptions(
-            model="nova-2",
-            language="en-US",
-            punctuate=True,
-            encoding="linear16",
-            channels=1,
-            sample_rate=16000,
-            interim_results=True,
-            utterance_end_ms="1000",
-            vad_events=True,
-            endpointing=300,
-            no_delay=True,
-        )
-
-        if dg_connection.start(options) is False:
-            print("Failed to connect to Deepgram")
+                if current_sentence:
+                    utterance_timer.touch()
+                else:
+                    utterance_timer.cancel()
+
+        # Greet the user while the pre-connected STT websocket is handed over (or reconnected)
+        capture.start()
+        # STT starts at the end of the wake word, less any pre-roll; audio from the greeting on is echo-gated
+        stt_position = capture.position if wake_position is None else wake_position
+        stt_position = capture.preroll_position(stt_position, STT_PREROLL_MS / 1000)
+        greeting_position = capture.position
+        tts_manager.speak(GREETING, cache=True)
+        dg_connection = stt_manager.acquire(on_message)
+        if dg_connection is None:
+            tts_manager.wait_for_completion()
             return
 
-        timeout_thread = threading.Thread(target=check_timeout, daemon=True)
-        timeout_thread.start()
-
-        microphone = Microphone(dg_connection.send)
-        microphone.start()
-        
-        answer("Hey pixie", store_in_history=False)  # Greet the user after microphone is initialized
+        utterance_timer.start()
+
+        send = dg_connection.send
+        control = lambda func: func()
+        chunk = MIC_CHUNK
+        if STT_ENCODING != "linear16":
+            sender = stt_sender_for(dg_connection)
+            send, control = sender.feed, sender.control
+            chunk = sender.encoder.align(MIC_CHUNK)
+        if VAD_GATE:
+            stt_gate = VADGate(send, keepalive=lambda: control(dg_connection.keep_alive),
+                               on_speech_end=lambda: control(dg_connection.finalize),
+                               vad=EnergyVAD(VAD_THRESHOLD), hangover=VAD_HANGOVER,
+                               end_of_utterance=LOCAL_END_OF_UTTERANCE)
+            send = stt_gate.feed
+        # The greeting is held back like any reply, and talking over it cuts it short
+        monitor = BargeInMonitor(send, interrupt_answer, vad=EnergyVAD(BARGE_IN_THRESHOLD, BARGE_IN_FRAMES),
+                                 preroll_frames=BARGE_IN_PREROLL_FRAMES, position=stt_position)
+        monitor.arm(at=greeting_position)
+        if BARGE_IN:
+            barge_in = monitor
+        microphone = CaptureStream(capture, monitor.feed, chunk=chunk)
+        microphone.start(stt_position)
+        tts_manager.wait_for_completion()
+        monitor.disarm()
         print("\n\nStart speaking. Say 'goodbye' or 'bye' to end the conversation.\n")
 
         exit_flag.clear()
-        while not exit_flag.is_set():
-            time.sleep(0.1)
-        
-        shutdown()
+        exit_flag.wait()
         return
 
     except Exception as e:
         print(f"An error occurred: {e}")
         return
     finally:
+        end_conversation()
         exit_flag.clear()
         current_sentence = ""
-        last_update_time = time.time()
+        utterance_start = None
+        turn_open = False
+        utterance_timer.cancel()
         displayed_sentence = ""
 
+class WakeWordListener:
+    """Porcupine created once; reads the shared capture only while waiting for the wake word."""
+
+    def __init__(self, capture):
+        self.capture = capture
+        self.porcupine = None
+        self.reader = None
+
+    @property
+    def position(self):
+        # Capture position right after the last frame Porcupine processed
+        return self.reader.position
+
+    def resume(self):
+        if self.porcupine is None:
+            self.porcupine = pvporcupine.create(access_key=porcupine_access_key, keyword_paths=[wakeword_path], sensitivities=[sensitivity])
+        self.capture.start()
+        self.reader = self.capture.reader()
+
+    def pause(self):
+        self.reader = None  # The capture keeps running for STT
+
+    def detected(self):
+        frame = self.reader.read(self.porcupine.frame_length, timeout=1)
+        if frame is None:
+            if not self.capture.running:
+                raise RuntimeError("Microphone capture stopped")
+            return False
+        return self.porcupine.process(frame) >= 0
+
+    def close(self):
+        self.reader = None
+        if self.porcupine is not None:
+            self.porcupine.delete()
+            self.porcupine = None
+
 def listen_for_wakeword():
-    global porcupine, recorder
+    global wake_position, turn_open
+    stt_manager.warm()
+    try:
+        tts_manager.prewarm(PREWARM_PHRASES)
+    except Exception as e:
+        # A cold cache only costs latency on the first replies
+        print(f"Could not prewarm the TTS cache: {e}")
+    prewarm_weather_scraper()
     print("Pixie is Ready")
+    wake_word = WakeWordListener(capture)
     while True:
         try:
-            porcupine = pvporcupine.create(access_key=porcupine_access_key, keyword_paths=[wakeword_path], sensitivities=[sensitivity])
-            recorder = PvRecorder(device_index=-1, frame_length=porcupine.frame_length)
-            recorder.start()
-
+            wake_word.resume()
             while True:
-                pcm = recorder.read()
-                keyword_index = porcupine.process(pcm)
-                if keyword_index >= 0:
+                if wake_word.detected():
+                    tracer.begin_turn("wake")
+                    turn_open = True
+                    wake_position = wake_word.position
                     print("Wake word detected!")
-                    recorder.stop()
-                    porcupine.delete()
+                    stt_manager.warm()  # No-op unless the idle connection was dropped
+                    wake_word.pause()
                     speech2speech()
+                    rearm_start = time.perf_counter()
                     tts_manager.reset()  # Reset TTS manager after conversation
-                    break  # Exit inner loop to reinitialize porcupine and recorder
+                    wake_word.resume()
+                    print(f"Re-armed in {(time.perf_counter() - rearm_start) * 1000:.1f} ms")
 
         except KeyboardInterrupt:
             print("Stopping...")
             break
         except Exception as e:
             print(f"An error occurred: {e}")
-        finally:
-            if 'recorder' in locals() and recorder is not None:
-                recorder.stop()
-            if 'porcupine' in locals() and porcupine is not None:
-                porcupine.delete()
+            # Rebuild the engines from scratch only after a failure
+            wake_word.close()
+            capture.stop()
+            tts_manager.reset(rebuild=True)
 
+    wake_word.close()
     shutdown()
 
-def shutdown():
-    global microphone, dg_connection, tts_manager
-    print("\nShutting down...")
+def end_conversation():
+    global microphone, stt_gate, barge_in
     if microphone:
         microphone.finish()
-    if 'dg_connection' in globals():
-        dg_connection.finish()
+        microphone = None
+    if stt_gate is not None:
+        print(f"[vad] sent {stt_gate.bytes_sent / 1024:.0f} KB to Deepgram, saved {stt_gate.bytes_saved / 1024:.0f} KB "
+              f"({stt_gate.bytes_saved / max(stt_gate.bytes_total, 1):.0%}), {stt_gate.keepalives} keepalives")
+        stt_gate = None
+    barge_in = None
+    if speculator is not None:
+        speculator.reset()
+        print(f"[speculate] {speculator.stats()}")
+    stt_manager.release()  # The websocket stays open for the next conversation
+
+def shutdown():
+    print("\nShutting down...")
+    print(f"Local intent hit rate: {intent_classifier.hit_rate:.0%} "
+          f"({intent_classifier.local_hits} local, {intent_classifier.fallbacks} LLM)")
+    print(f"Intent cache: {intent_cache.stats()}")
+    intent_cache.save()
+    print(f"Tools: {tool_dispatcher.stats()}")
+    for hedger in (llm_hedger, intent_hedger):
+        if hedger is not None:
+            print(f"[hedge] {hedger.name}: {hedger.stats()}")
+            hedger.close()
+    if speculator is not None:
+        speculator.close()
+    tool_dispatcher.shutdown()
+    if weather_scraper is not None:
+        weather_scraper.close()
+    if wiki_lookup is not None:
+        wiki_lookup.close()
+    if tracer.enabled:
+        print(tracer.report())
+        tracer.close()
+    end_conversation()
+    if stt_sender is not None:
+        print(f"[stt] {STT_ENCODING} sent {stt_sender.bytes_out / 1024:.0f} KB for "
+              f"{stt_sender.bytes_in / 1024:.0f} KB of audio")
+        stt_sender.close()
+    stt_manager.close()
+    capture.stop()
     tts_manager.cleanup()
+    audio_output.close()
 
 if __name__ == "__main__":
     listen_for_wakeword()
\ No newline at end of file
@@ -1,46 +1,134 @@
-from playwright.sync_api import sync_playwright
-from playwright_stealth import stealth_sync
+import asyncio
+import threading
+import time
+from collections import namedtuple
+from playwright.async_api import async_playwright
+from playwright_stealth import stealth_async
+
+POOL_SIZE = 4
+FETCH_TIMEOUT = 8  # Seconds per URL, counted from the call
+
+FetchResult = namedtuple("FetchResult", ["url", "text", "error", "elapsed"])
+
+
+async def block_resources(route):
+    # Block unnecessary resources like images, stylesheets, and fonts
+    if route.request.resource_type in ['image', 'stylesheet', 'font']:
+        await route.abort()
+    else:
+        await route.continue_()
+
 
 class PlaywrightWebKitScraper:
-    def __init__(self, headless=True):
+    """Headless WebKit with a pool of pre-warmed pages.
+
+    Playwright runs on its own event loop thread. Pages are created, stealth
+    configured and routed once, then reused, so a fetch is just a goto.
+    fetch_many() fetches several URLs in parallel, at most pool_size at a
+    time; the public methods are synchronous and can be called from any
+    thread.
+    """
+
+    def __init__(self, headless=True, pool_size=POOL_SIZE):
+        self.headless = headless
+        self.pool_size = pool_size
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self._pages = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._run(self._start())
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _start(self):
         # Start Playwright and launch WebKit browser in headless mode
-        self.playwright = sync_playwright().start()
-        self.browser = self.playwright.webkit.launch(headless=headless)
-
-        # Create a browser context (isolated session)
-        self.context = self.browser.new_context()
-
-    def get_page_text_content(self, url):
-        # Create a new page within the existing browser context
-        page = self.context.new_page()
-        stealth_sync(page)  # Use stealth to avoid detection
-        
-        # Block unnecessary resources like images, stylesheets, and fonts
-        def block_resources(route):
-            if route.request.resource_type in ['image', 'stylesheet', 'font']:
-                route.abort()
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.webkit.launch(headless=self.headless)
+
+        # Create a browser context (isolated session); routing applies to every page in it
+        self.context = await self.browser.new_context()
+        await self.context.route("**/*", block_resources)
+
+        self._pages = asyncio.Queue()
+        for page in await asyncio.gather(*(self._new_page() for _ in range(self.pool_size))):
+            self._pages.put_nowait(page)
+
+    async def _new_page(self):
+        page = await self.context.new_page()
+        await stealth_async(page)  # Use stealth to avoid detection
+        return page
+
+    async def _replace_page(self, page):
+        # A page that failed or timed out mid-navigation is not trusted for reuse
+        try:
+            await page.close()
+        except Exception:
+            pass
+        try:
+            self._pages.put_nowait(await self._new_page())
+        except Exception as e:
+            print(f"Could not replace scraper page: {e}")
+
+    async def _page_text(self, url):
+        page = await self._pages.get()
+        ok = False
+        try:
+            # Navigate to the target website and wait for the DOM to load
+            response = await page.goto(url, wait_until='domcontentloaded')
+            if response is not None and response.status >= 400:
+                raise RuntimeError(f"HTTP {response.status} from {url}")
+            text = await page.inner_text('body')
+            ok = True
+            return text
+        finally:
+            if ok:
+                self._pages.put_nowait(page)
             else:
-                route.continue_()
+                self._loop.create_task(self._replace_page(page))
 
-        page.route("**/*", block_resources)
+    async def _fetch(self, url, timeout):
+        start = time.monotonic()
+        try:
+            text = await asyncio.wait_for(self._page_text(url), timeout)
+            return FetchResult(url, text, None, time.monotonic() - start)
+        except asyncio.TimeoutError:
+            return FetchResult(url, None, TimeoutError(f"Timed out after {timeout}s"), time.monotonic() - start)
+        except Exception as e:
+            return FetchResult(url, None, e, time.monotonic() - start)
 
-        # Navigate to the target website and wait for the DOM to load
-        page.goto(url, wait_until='domcontentloaded')
+    def fetch_many(self, urls, timeout=FETCH_TIMEOUT):
+        """Fetch the visible text of urls in parallel.
 
-        # Extract and return all visible text content from the body of the page
-        page_text = page.inner_text('body')
+        Each URL gets timeout seconds from the call, including any wait for a
+        free page. Returns a FetchResult per URL, in order; failed or timed
+        out URLs have text None and the exception in error.
+        """
+        async def fetch_all():
+            return await asyncio.gather(*(self._fetch(url, timeout) for url in urls))
+        return self._run(fetch_all())
 
-        # Close the page (browser stays open for reuse)
-        page.close()
-        return page_text
+    def get_page_text_content(self, url, timeout=FETCH_TIMEOUT):
+        result = self.fetch_many([url], timeout)[0]
+        if result.error is not None:
+            raise result.error
+        return result.text
 
     def close(self):
         # Close the browser and stop Playwright when finished
-        self.browser.close()
-        self.playwright.stop()
+        async def stop():
+            await self.browser.close()
+            await self.playwright.stop()
+        self._run(stop())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
 
 if __name__ == "__main__":
-    # Initialize WebKit scraper (preloads the browser)
+    # Initialize WebKit scraper (preloads the browser and its pages)
     scraper = PlaywrightWebKitScraper()
     print("Loaded")
     # Fetch and print the text content of a webpage
@@ -48,10 +136,13 @@ if __name__ == "__main__":
     content = scraper.get_page_text_content(url)
     print(content)
 
-    # # Optionally reuse the scraper for multiple URLs
-    # another_url = "https://another-example.com"
-    # content = scraper.get_page_text_content(another_url)
-    # print(content)
+    # Several sources at once; slow or failing ones don't hold up the rest
+    urls = [
+        "https://www.google.com/search?q=weather+in+kochi&sourceid=chrome&ie=UTF-8",
+        "https://news.google.com/",
+    ]
+    for result in scraper.fetch_many(urls, timeout=5):
+        print(result.url, f"{result.elapsed:.2f}s", result.error or f"{len(result.text)} chars")
 
     # Close the browser after all operations are done
     scraper.close()
@@ -0,0 +1,136 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from intent import normalize_utterance
+from timers import DeadlineTimer
+
+SPECULATION_WORKERS = 2
+
+
+class Speculation:
+    """Intent and tool results being worked out for one interim transcript."""
+
+    def __init__(self, key, text):
+        self.key = key
+        self.text = text
+        self.started = time.monotonic()
+        self.intent = Future()  # (response, seconds), like timed(get_query_type, text)
+        self.tools = Future()  # [ToolResult], or None when the intent needs no tools
+        self.cancelled = threading.Event()
+        self.intent_source = None
+        self.tool_calls = 0
+
+
+class SpeculativePrefetch:
+    """Starts intent classification and tool prefetch while the user is still talking.
+
+    update(text) is called with every new interim transcript. Once the text
+    has not changed for stable_seconds, classify(text) -> (response, source)
+    runs, and if tool_tags(response) lists any tools, run_tools(tags, text)
+    prefetches them. take(final_text) returns the speculation when the final
+    transcript matches it and throws it away otherwise. A wasted request is
+    an LLM intent request or a tool call made for a thrown away speculation.
+    """
+
+    def __init__(self, classify, tool_tags, run_tools, stable_seconds=0.3, workers=SPECULATION_WORKERS):
+        self.classify = classify
+        self.tool_tags = tool_tags
+        self.run_tools = run_tools
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speculate")
+        self.timer = DeadlineTimer(stable_seconds, self._on_stable)
+        self.timer.start()
+        self.current = None
+        self._pending = None
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted_requests = 0
+        self.lead_seconds = 0.0
+
+    def update(self, text):
+        key = normalize_utterance(text)
+        if not key:
+            return
+        with self._lock:
+            if self._pending is not None and self._pending[0] == key:
+                return  # Same words again; the stability clock keeps running
+            if self._pending is None and self.current is not None and self.current.key == key:
+                return
+            self._pending = (key, text)
+        self.timer.touch()
+
+    def take(self, text):
+        """The speculation for the final transcript text, or None if there is none that matches."""
+        self.timer.cancel()
+        with self._lock:
+            speculation, self.current, self._pending = self.current, None, None
+        if speculation is None:
+            return None
+        if speculation.key != normalize_utterance(text):
+            self._discard(speculation)
+            return None
+        self.hits += 1
+        self.lead_seconds += time.monotonic() - speculation.started
+        return speculation
+
+    def reset(self):
+        self.timer.cancel()
+        with self._lock:
+            speculation, self.current, self._pending = self.current, None, None
+        if speculation is not None:
+            self._discard(speculation)
+
+    def _on_stable(self):
+        with self._lock:
+            if self._pending is None:
+                return
+            key, text = self._pending
+            self._pending = None
+            previous = self.current
+            if previous is not None and previous.key == key:
+                return
+            speculation = self.current = Speculation(key, text)
+            self.started += 1
+        if previous is not None:
+            self._discard(previous)
+        self.executor.submit(self._run, speculation)
+
+    def _discard(self, speculation):
+        speculation.cancelled.set()
+        self.misses += 1
+
+        def count_waste(_):
+            self.wasted_requests += (speculation.intent_source == "llm") + speculation.tool_calls
+
+        speculation.tools.add_done_callback(count_waste)
+
+    def _run(self, speculation):
+        start = time.perf_counter()
+        try:
+            response, speculation.intent_source = self.classify(speculation.text)
+            speculation.intent.set_result((response, time.perf_counter() - start))
+            tags = self.tool_tags(response)
+            if not tags or speculation.cancelled.is_set():
+                speculation.tools.set_result(None)
+                return
+            speculation.tool_calls = len(tags)
+            speculation.tools.set_result(self.run_tools(tags, speculation.text))
+        except Exception as e:
+            for future in (speculation.intent, speculation.tools):
+                if not future.done():
+                    future.set_exception(e)
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.started if self.started else 0.0
+
+    def stats(self):
+        return {"started": self.started, "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate,
+                "wasted_requests": self.wasted_requests,
+                "avg_lead_ms": self.lead_seconds / self.hits * 1000 if self.hits else 0.0}
+
+    def close(self):
+        self.reset()
+        self.timer.stop()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -6,16 +6,20 @@ from deepgram import (
     LiveOptions,
     Microphone,
 )
+import os
 import sys
 import shutil
-import time
 import threading
+from timers import DeadlineTimer
+from stt_encoding import EncodingSender, create_encoder
 
 load_dotenv()
 
+STT_ENCODING = os.getenv("STT_ENCODING", "linear16")  # linear16, mulaw or opus
+MIC_CHUNK = 8000  # About deepgram.Microphone's default of 8194, rounded to whole Opus frames
+
 current_sentence = ""
 displayed_sentence = ""
-last_update_time = time.time()
 processing_lock = threading.Lock()
 
 def process(sentence, is_final):
@@ -33,16 +37,15 @@ def display_sentence(sentence, end="\n"):
     print(f"\rUSER: {sentence}", end=end, flush=True)
     displayed_sentence = sentence
 
-def check_timeout():
-    global current_sentence, last_update_time
-    while True:
-        time.sleep(0.01)  # Check every 100ms
-        with processing_lock:
-            if current_sentence and time.time() - last_update_time > 2:
-                display_sentence(current_sentence)
-                process(current_sentence, False)
-                current_sentence = ""
-                last_update_time = time.time()
+def on_utterance_timeout():
+    global current_sentence
+    with processing_lock:
+        if current_sentence:
+            display_sentence(current_sentence)
+            process(current_sentence, False)
+            current_sentence = ""
+
+utterance_timer = DeadlineTimer(2, on_utterance_timeout)
 
 def main():
     try:
@@ -52,7 +55,7 @@ def main():
         dg_connection = deepgram.listen.websocket.v("1")
 
         def on_message(self, result, **kwargs):
-            global current_sentence, last_update_time, displayed_sentence
+            global current_sentence, displayed_sentence
             transcript = result.channel.alternatives[0].transcript
             if len(transcript) == 0:
                 return
@@ -71,7 +74,10 @@ def main():
                     if temp_sentence != displayed_sentence:
                         display_sentence(temp_sentence, end="")
                 
-                last_update_time = time.time()
+                if current_sentence:
+                    utterance_timer.touch()
+                else:
+                    utterance_timer.cancel()
 
         def on_close(self, close, **kwargs):
             print("\nConnection Closed")
@@ -87,7 +93,7 @@ def main():
             model="nova-2",
             language="en-US",
             smart_format=True,
-            encoding="linear16",
+            encoding=STT_ENCODING,
             channels=1,
             sample_rate=16000,
             interim_results=True,
@@ -102,15 +108,24 @@ def main():
             print("Failed to connect to Deepgram")
             return
 
-        # Start the timeout checking thread
-        timeout_thread = threading.Thread(target=check_timeout, daemon=True)
-        timeout_thread.start()
-
-        microphone = Microphone(dg_connection.send)
+        # Start the utterance timeout thread; it only wakes when a deadline expires
+        utterance_timer.start()
+
+        encoder = create_encoder(STT_ENCODING)
+        if encoder is None:
+            sender = None
+            microphone = Microphone(dg_connection.send)
+        else:
+            # Encoded on a worker thread so the microphone callback never waits
+            sender = EncodingSender(dg_connection.send, encoder)
+            microphone = Microphone(sender.feed, chunk=encoder.align(MIC_CHUNK))
         microphone.start()
         input()
         microphone.finish()
+        if sender is not None:
+            sender.close()
         dg_connection.finish()
+        utterance_timer.stop()
 
         print("\nFinished")
 
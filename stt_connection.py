@@ -0,0 +1,95 @@
+import threading
+import time
+from deepgram import (
+    DeepgramClient,
+    DeepgramClientOptions,
+    LiveTranscriptionEvents,
+)
+
+
+class STTConnectionManager:
+    """One Deepgram live-transcription websocket reused across conversations.
+
+    warm() opens the connection in the background so the TLS and websocket
+    handshake happen before the user starts talking. While idle the SDK
+    keepalive thread keeps it open, and acquire() hands the same connection
+    to the next conversation. Transcript events go to the handler passed to
+    acquire(). url can point at a local server speaking the Deepgram
+    transcript protocol, e.g. "http://127.0.0.1:8765".
+    """
+
+    def __init__(self, options, api_key="", url="", connect_timeout=10):
+        self.options = options
+        self.connect_timeout = connect_timeout
+        config = DeepgramClientOptions(url=url, options={"keepalive": "true"})
+        self.deepgram = DeepgramClient(api_key, config)
+        self.connection = None
+        self.on_transcript = None
+        self.connects = 0
+        self.reuses = 0
+        self.last_connect_time = None
+        self._lock = threading.Lock()
+        self._connect_thread = None
+
+    def is_connected(self):
+        connection = self.connection
+        return connection is not None and connection.is_connected()
+
+    def warm(self):
+        """Start connecting in the background unless already connected or connecting."""
+        with self._lock:
+            if self.is_connected():
+                return
+            if self._connect_thread is not None and self._connect_thread.is_alive():
+                return
+            self._connect_thread = threading.Thread(target=self._connect, daemon=True)
+            self._connect_thread.start()
+
+    def _connect(self):
+        connection = self.deepgram.listen.websocket.v("1")
+        connection.on(LiveTranscriptionEvents.Transcript, self._dispatch_transcript)
+        connection.on(LiveTranscriptionEvents.Close, self._on_close)
+        connection.on(LiveTranscriptionEvents.Error, self._on_error)
+
+        start = time.perf_counter()
+        if connection.start(self.options) is False:
+            print("Failed to connect to Deepgram")
+            return
+        self.last_connect_time = time.perf_counter() - start
+        self.connection = connection
+        self.connects += 1
+        print(f"Deepgram connected in {self.last_connect_time * 1000:.0f} ms")
+
+    def acquire(self, on_transcript):
+        """Return the open connection, connecting first if needed; None on failure."""
+        self.on_transcript = on_transcript
+        if self.is_connected():
+            self.reuses += 1
+            return self.connection
+        self.warm()
+        connect_thread = self._connect_thread
+        if connect_thread is not None:
+            connect_thread.join(self.connect_timeout)
+        return self.connection if self.is_connected() else None
+
+    def release(self):
+        # Keep the socket open for the next conversation; transcripts are dropped until then
+        self.on_transcript = None
+
+    def close(self):
+        self.on_transcript = None
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            connection.finish()
+
+    def _dispatch_transcript(self, client, result, **kwargs):
+        on_transcript = self.on_transcript
+        if on_transcript is not None:
+            on_transcript(client, result, **kwargs)
+
+    def _on_close(self, client, close, **kwargs):
+        if client is self.connection:
+            self.connection = None
+
+    def _on_error(self, client, error, **kwargs):
+        print(f"\nDeepgram error: {error}")
@@ -0,0 +1,186 @@
+import struct
+import threading
+from queue import Queue
+import numpy as np
+
+ENCODINGS = ("linear16", "mulaw", "opus")
+OPUS_FRAME_SECONDS = 0.02
+OPUS_BITRATE = 24000
+OPUS_PRE_SKIP = 312  # 6.5 ms at 48 kHz, libopus' encoder lookahead
+MULAW_BIAS = 0x84
+MULAW_CLIP = 32635
+
+
+def mulaw_encode(samples):
+    """G.711 mu-law encode int16 samples to one byte each."""
+    samples = np.asarray(samples, dtype=np.int16).astype(np.int32)
+    sign = np.where(samples < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(samples), MULAW_CLIP) + MULAW_BIAS
+    exponent = np.floor(np.log2(magnitude)).astype(np.int32) - 7
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+class MulawEncoder:
+    """Raw 8-bit mu-law, half the bytes of linear16 at the same sample rate."""
+
+    encoding = "mulaw"
+    frame_size = 1
+
+    def __init__(self, sample_rate=16000):
+        self.sample_rate = sample_rate
+
+    def align(self, chunk):
+        return chunk
+
+    def encode(self, pcm):
+        return mulaw_encode(np.frombuffer(pcm, dtype=np.int16))
+
+
+def _ogg_crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+OGG_CRC_TABLE = _ogg_crc_table()
+
+
+def ogg_crc(data):
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ OGG_CRC_TABLE[((crc >> 24) & 0xFF) ^ byte]
+    return crc
+
+
+class OggWriter:
+    """Packs packets into Ogg pages, one page per add() call."""
+
+    def __init__(self, serial=0x50495845):
+        self.serial = serial
+        self.sequence = 0
+
+    def page(self, packets, granule, first=False, last=False):
+        lacing = bytearray()
+        for packet in packets:
+            lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+        if len(lacing) > 255:
+            raise ValueError("Too many packets for one Ogg page")
+        header_type = (0x02 if first else 0) | (0x04 if last else 0)
+        header = struct.pack("<4sBBqIIIB", b"OggS", 0, header_type, granule, self.serial, self.sequence, 0, len(lacing))
+        page = bytearray(header + lacing + b"".join(packets))
+        struct.pack_into("<I", page, 22, ogg_crc(page))
+        self.sequence += 1
+        return bytes(page)
+
+
+class OpusEncoder:
+    """Ogg Opus stream, as Deepgram's encoding=opus expects.
+
+    Capture chunks are cut into 20 ms Opus frames and each chunk becomes one
+    Ogg page; the first encode() output starts with the OpusHead and
+    OpusTags header pages. Needs opuslib and libopus.
+    """
+
+    encoding = "opus"
+
+    def __init__(self, sample_rate=16000, bitrate=OPUS_BITRATE, packet_encoder=None):
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * OPUS_FRAME_SECONDS)
+        if packet_encoder is None:
+            try:
+                import opuslib
+            except ImportError:
+                raise ImportError("STT_ENCODING=opus needs opuslib (pip install opuslib) and libopus") from None
+            packet_encoder = opuslib.Encoder(sample_rate, 1, "voip")
+            packet_encoder.bitrate = bitrate
+        self.packet_encoder = packet_encoder
+        self.ogg = OggWriter()
+        self.granule = OPUS_PRE_SKIP
+        self.started = False
+
+    def align(self, chunk):
+        """Round a capture chunk down to whole Opus frames."""
+        return max(self.frame_size, chunk // self.frame_size * self.frame_size)
+
+    def headers(self):
+        head = struct.pack("<8sBBHIhB", b"OpusHead", 1, 1, OPUS_PRE_SKIP, self.sample_rate, 0, 0)
+        vendor = b"pixie"
+        tags = b"OpusTags" + struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", 0)
+        return self.ogg.page([head], 0, first=True) + self.ogg.page([tags], 0)
+
+    def encode(self, pcm):
+        frame_bytes = self.frame_size * 2
+        packets = [self.packet_encoder.encode(pcm[start:start + frame_bytes], self.frame_size)
+                   for start in range(0, len(pcm) - frame_bytes + 1, frame_bytes)]
+        if not packets:
+            return b""
+        self.granule += len(packets) * self.frame_size * 48000 // self.sample_rate  # Ogg Opus granules count 48 kHz samples
+        out = b"" if self.started else self.headers()
+        self.started = True
+        return out + self.ogg.page(packets, self.granule)
+
+
+def create_encoder(encoding, sample_rate=16000):
+    """Encoder for STT_ENCODING, or None for raw linear16 (also when opuslib is missing)."""
+    if encoding == "linear16":
+        return None
+    if encoding == "mulaw":
+        return MulawEncoder(sample_rate)
+    if encoding == "opus":
+        try:
+            return OpusEncoder(sample_rate)
+        except ImportError as e:
+            print(f"{e}; sending linear16 instead")
+            return None
+    raise ValueError(f"Unknown STT encoding {encoding!r}; choose from {', '.join(ENCODINGS)}")
+
+
+class EncodingSender:
+    """Encodes PCM chunks on a worker thread so the capture thread never waits on the encoder.
+
+    Control messages (KeepAlive, Finalize) go through control() so they are
+    sent in order with the audio queued before them. With no encoder the
+    PCM is sent as linear16.
+    """
+
+    def __init__(self, send, encoder):
+        self.send = send
+        self.encoder = encoder
+        self.encoding = "linear16" if encoder is None else encoder.encoding
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._queue = Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def feed(self, pcm):
+        self._queue.put(pcm)
+
+    def control(self, func):
+        self._queue.put(func)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                if callable(item):
+                    item()
+                    continue
+                data = item if self.encoder is None else self.encoder.encode(item)
+                self.bytes_in += len(item)
+                if data:
+                    self.send(data)
+                    self.bytes_out += len(data)
+            except Exception as e:
+                print(f"STT encoder error: {e}")
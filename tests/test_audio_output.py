@@ -0,0 +1,99 @@
+import numpy as np
+from audio_output import AudioOutput, NullStream, Resampler
+
+
+class RecordingStream(NullStream):
+    opened = []
+
+    def __init__(self, samplerate, **kwargs):
+        super().__init__(samplerate, speed=50, **kwargs)
+        self.written = []
+        RecordingStream.opened.append(self)
+
+    def write(self, data):
+        self.written.append(data)
+        super().write(data)
+
+
+def make_output(**kwargs):
+    RecordingStream.opened = []
+    return AudioOutput(output_stream=RecordingStream, **kwargs)
+
+
+def test_single_rate_plays_at_the_native_rate_without_resampling():
+    output = make_output()
+    pcm = (np.arange(22050) % 200).astype(np.int16)
+    try:
+        output.play(pcm, 22050, queue=True).wait(5)
+        source = output.open_source(22050, queue=True)
+        source.write(pcm)
+        source.end()
+        assert source.wait(5)
+    finally:
+        output.close()
+    stream, = RecordingStream.opened
+    assert stream.samplerate == 22050
+    assert output.resampled_sources == 0
+    played = np.concatenate(stream.written)
+    # Both passed through sample for sample, each padded out to whole blocks
+    padded = -(-len(pcm) // output.block_size) * output.block_size
+    assert np.array_equal(played[:len(pcm)], pcm)
+    assert not played[len(pcm):padded].any()
+    assert np.array_equal(played[padded:padded + len(pcm)], pcm)
+
+
+def test_clip_at_the_device_rate_is_not_copied():
+    output = make_output()
+    pcm = np.ones(output.block_size * 3, dtype=np.int16)
+    try:
+        output.play(pcm, output.sample_rate).wait(5)
+    finally:
+        output.close()
+    first = RecordingStream.opened[0].written[0]
+    assert np.shares_memory(first, pcm)
+
+
+def test_device_follows_the_rate_once_idle():
+    output = make_output()
+    try:
+        output.play(np.ones(4800, dtype=np.int16), 48000).wait(5)
+        output.play(np.ones(2205, dtype=np.int16), 22050).wait(5)
+    finally:
+        output.close()
+    assert [stream.samplerate for stream in RecordingStream.opened] == [48000, 22050]
+    assert output.device_opens == 2
+
+
+def test_only_a_source_joining_at_another_rate_is_resampled():
+    output = make_output()
+    try:
+        speech = output.open_source(22050, queue=True)
+        speech.write(np.full(22050, 1000, dtype=np.int16))
+        earcon = output.play(np.full(4800, 500, dtype=np.int16), 48000, gain=0.5)
+        speech.end()
+        assert speech.wait(5) and earcon.wait(5)
+    finally:
+        output.close()
+    assert output.device_opens == 1
+    assert RecordingStream.opened[0].samplerate == 22050
+    assert output.resampled_sources == 1
+    assert max(int(block.max()) for block in RecordingStream.opened[0].written) == 1250
+
+
+def test_fixed_rate_resamples_everything():
+    output = make_output(sample_rate=48000)
+    try:
+        output.play(np.ones(2205, dtype=np.int16), 22050).wait(5)
+    finally:
+        output.close()
+    assert RecordingStream.opened[0].samplerate == 48000
+    assert output.resampled_sources == 1
+
+
+def test_resampler_is_continuous_across_packets():
+    signal = np.round(np.sin(np.arange(2205) / 10) * 10000).astype(np.int16)
+    whole = Resampler(22050, 48000).process(signal)
+    resampler = Resampler(22050, 48000)
+    pieces = np.concatenate([resampler.process(signal[start:start + 333]) for start in range(0, len(signal), 333)])
+    assert len(whole) == len(pieces)
+    assert np.abs(whole.astype(int) - pieces).max() <= 1
@@ -0,0 +1,31 @@
+import numpy as np
+from capture import AudioCapture
+
+
+def make_capture(buffer_seconds=1.0, recorded_seconds=0.0):
+    capture = AudioCapture(sample_rate=1000, buffer_seconds=buffer_seconds)
+    samples = np.arange(int(recorded_seconds * 1000)) % 30000
+    for start in range(0, len(samples), 100):
+        capture._append(samples[start:start + 100].astype(np.int16))
+    return capture
+
+
+def test_preroll_reaches_back_from_the_wake_word():
+    capture = make_capture(recorded_seconds=0.8)
+    assert capture.preroll_position(700, 0.3) == 400
+    assert capture.preroll_position(700, 0) == 700
+
+
+def test_preroll_is_clamped_to_what_the_buffer_still_holds():
+    capture = make_capture(buffer_seconds=1.0, recorded_seconds=2.5)
+    assert capture.oldest_position == 1500
+    assert capture.preroll_position(1700, 0.5) == 1500
+    assert make_capture(recorded_seconds=0.1).preroll_position(50, 0.3) == 0
+
+
+def test_reader_starts_at_the_preroll_position():
+    capture = make_capture(buffer_seconds=1.0, recorded_seconds=2.5)
+    reader = capture.reader(capture.preroll_position(2300, 0.2))
+    samples = reader.read(100, timeout=0)
+    assert list(samples[:3]) == [2100, 2101, 2102]
+    assert reader.position == 2200
@@ -0,0 +1,131 @@
+import itertools
+import threading
+import time
+from fakes import FakeClock
+from hedging import Hedger
+
+
+def make_hedger(**kwargs):
+    return Hedger("test", min_delay=0.01, min_samples=5, **kwargs)
+
+
+def test_latency_is_measured_on_the_injected_clock():
+    clock = FakeClock()
+    hedger = make_hedger(clock=clock)
+
+    def request():
+        clock.advance(0.25)  # Each request "takes" 250 ms on the fake clock
+        return "ok"
+
+    try:
+        for _ in range(5):
+            assert hedger.call(request) == "ok"
+        assert hedger.delay() == 0.25
+        assert hedger.stats()["p50_ms"] == 250
+    finally:
+        hedger.close()
+
+
+def test_no_hedge_below_the_p90_deadline():
+    hedger = make_hedger()
+    for _ in range(20):
+        hedger.observe(0.3)
+    calls = itertools.count()
+
+    def request():
+        next(calls)
+        time.sleep(0.02)
+        return "fast"
+
+    try:
+        assert hedger.call(request) == "fast"
+        assert next(calls) == 1
+        assert hedger.hedges == 0
+    finally:
+        hedger.close()
+
+
+def test_hedge_fires_at_the_p90_deadline_and_the_winner_is_returned():
+    hedger = make_hedger()
+    for _ in range(20):
+        hedger.observe(0.1)
+    start = time.monotonic()
+    started = []
+    stalled = threading.Event()
+    discarded = []
+
+    def request():
+        started.append(time.monotonic() - start)
+        return "first" if len(started) == 1 else "second"
+
+    def finish(handle):
+        if handle == "first":
+            stalled.wait(5)  # Stalls until it is aborted
+            return "first result"
+        return "second result"
+
+    def discard(handle):
+        discarded.append((handle, time.monotonic() - start))
+        stalled.set()
+
+    try:
+        assert hedger.call(request, finish, discard) == "second result"
+        assert hedger.hedges == 1 and hedger.hedge_wins == 1
+        assert 0.09 <= started[1] < 0.2
+        # The stalled request is aborted as soon as the duplicate answers, not when it would have finished
+        assert discarded[0][0] == "first"
+        assert discarded[0][1] < 0.3
+    finally:
+        stalled.set()
+        hedger.close()
+
+
+def test_loser_still_opening_is_discarded_once_it_opens():
+    hedger = make_hedger(initial_delay=0.05)
+    opening = threading.Event()
+    discarded = threading.Event()
+    handles = itertools.count()
+
+    def request():
+        handle = next(handles)
+        if handle == 0:
+            opening.wait(5)
+        return handle
+
+    try:
+        assert hedger.call(request, discard=lambda handle: discarded.set() if handle == 0 else None) == 1
+        assert not discarded.is_set()
+        opening.set()
+        assert discarded.wait(1)
+    finally:
+        opening.set()
+        hedger.close()
+
+
+def test_failed_request_falls_back_to_the_other():
+    hedger = make_hedger(initial_delay=0.05)
+    handles = itertools.count()
+
+    def request():
+        if next(handles) == 0:
+            time.sleep(0.1)
+            raise RuntimeError("connection reset")
+        time.sleep(0.1)
+        return "duplicate"
+
+    try:
+        assert hedger.call(request) == "duplicate"
+    finally:
+        hedger.close()
+
+
+def test_token_bucket_bounds_the_hedge_rate():
+    hedger = Hedger("test", initial_delay=0.005, min_samples=1000, max_rate=0.1, burst=1)
+    try:
+        for _ in range(40):
+            hedger.call(lambda: time.sleep(0.02))
+        # At most the burst plus max_rate of the requests, although every request was slow enough to hedge
+        assert 0 < hedger.hedges <= 1 + 0.1 * 40
+        assert hedger.stats()["hedge_rate"] <= 0.125
+    finally:
+        hedger.close()
@@ -0,0 +1,56 @@
+import pytest
+from intent import CONFIDENCE_THRESHOLD, LocalIntentClassifier, extract_location
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return LocalIntentClassifier()
+
+
+@pytest.mark.parametrize("text, location", [
+    ("What's the weather in Paris and do I have any emails?", "Paris"),
+    ("Weather forecast for tomorrow in London?", "London"),
+    ("Will it rain in Seattle this afternoon?", "Seattle"),
+    ("Is it cold in London right now?", "London"),
+    ("What is the weather in St. Louis, Missouri?", "St. Louis"),
+    ("weather in new york city tomorrow", "new york city"),
+    ("What's the weather like?", "CURRENT"),
+    ("Will it snow tonight?", "CURRENT"),
+])
+def test_extract_location_stops_at_conjunctions_time_words_and_punctuation(text, location):
+    assert extract_location(text) == location
+
+
+def test_multi_tag_query_keeps_order_and_clean_location(classifier):
+    assert classifier.classify("What's the weather in Paris and do I have any emails?") == \
+        ("[GET_WEATHER=Paris][GET_EMAIL]", 1.0)
+
+
+@pytest.mark.parametrize("text, tags", [
+    ("Help me", "[SOS]"),
+    ("Please call for help", "[SOS]"),
+    ("This is an emergency", "[SOS]"),
+    ("Call an ambulance", "[SOS]"),
+    ("What's the latest news?", "[GET_NEWS=CURRENT]"),
+    ("Read me the morning news", "[GET_NEWS=CURRENT]"),
+    ("What am I looking at?", "[GET_CAMERA]"),
+    ("Look at this", "[GET_CAMERA]"),
+    ("What is this?", "[GET_CAMERA]"),
+])
+def test_rules_match_real_requests(classifier, text, tags):
+    assert classifier.classify(text) == (tags, 1.0)
+
+
+@pytest.mark.parametrize("text, wrong_tag", [
+    ("Can you help me write a poem?", "[SOS]"),
+    ("help me understand photosynthesis", "[SOS]"),
+    ("What's an emergency fund?", "[SOS]"),
+    ("I have some good news", "[GET_NEWS=CURRENT]"),
+    ("what is this song", "[GET_CAMERA]"),
+])
+def test_ordinary_sentences_are_not_routed_to_tools(classifier, text, wrong_tag):
+    tags, confidence = classifier.classify(text)
+    assert confidence < 1.0
+    # Either classified as something else or left to the LLM
+    assert tags != wrong_tag or confidence < CONFIDENCE_THRESHOLD
+    assert classifier.predict(text) != wrong_tag
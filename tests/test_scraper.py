@@ -0,0 +1,89 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+pytest.importorskip("playwright")
+from scraper import PlaywrightWebKitScraper
+
+SLOW_SECONDS = 3
+TIMEOUT = 1.0
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/slow"):
+            time.sleep(SLOW_SECONDS)
+        status = 500 if self.path.startswith("/error") else 200
+        body = f"<html><body><p>page {self.path}</p></body></html>".encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def scraper():
+    try:
+        scraper = PlaywrightWebKitScraper(pool_size=2)
+    except Exception as e:
+        pytest.skip(f"WebKit cannot launch here: {e}")
+    yield scraper
+    scraper.close()
+
+
+def pool_pages(scraper):
+    async def pages():
+        return list(scraper._pages._queue)
+    return scraper._run(pages())
+
+
+def test_fetch_many_returns_partial_results_in_order(server, scraper):
+    urls = [f"{server}/fast/1", f"{server}/slow", f"{server}/error", f"{server}/fast/2"]
+    start = time.monotonic()
+    results = scraper.fetch_many(urls, timeout=TIMEOUT)
+    elapsed = time.monotonic() - start
+
+    assert [result.url for result in results] == urls
+    assert "page /fast/1" in results[0].text
+    assert "page /fast/2" in results[3].text
+    # The slow page times out on its own without holding up the batch
+    assert results[1].text is None and isinstance(results[1].error, TimeoutError)
+    assert results[2].text is None and "500" in str(results[2].error)
+    assert elapsed < SLOW_SECONDS
+
+
+def test_errored_page_is_replaced_not_reused(server, scraper):
+    before = pool_pages(scraper)
+    result = scraper.fetch_many([f"{server}/error"], timeout=TIMEOUT)[0]
+    assert result.error is not None
+
+    deadline = time.monotonic() + 5
+    while len(pool_pages(scraper)) < len(before):
+        assert time.monotonic() < deadline, "the errored page was never replaced"
+        time.sleep(0.05)
+    after = pool_pages(scraper)
+    assert len(after) == len(before)
+    replaced = [page for page in before if page not in after]
+    assert len(replaced) == 1 and replaced[0].is_closed()
+
+    # A successful fetch hands its page back to the pool
+    assert scraper.fetch_many([f"{server}/fast/3"], timeout=TIMEOUT)[0].error is None
+    assert set(map(id, pool_pages(scraper))) == set(map(id, after))
@@ -0,0 +1,103 @@
+import threading
+import time
+import pytest
+from deepgram import LiveOptions
+from deepgram.clients.listen.v1.websocket import client as listen_client
+from fakes import FakeDeepgramTranscriptServer
+from stt_connection import STTConnectionManager
+
+OPTIONS = LiveOptions(model="nova-2", language="en-US", encoding="linear16", sample_rate=16000, channels=1)
+
+
+@pytest.fixture
+def server():
+    server = FakeDeepgramTranscriptServer(word_delay=0.01).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def manager(server):
+    manager = STTConnectionManager(OPTIONS, api_key="fake", url=server.http_url, connect_timeout=5)
+    yield manager
+    manager.close()
+
+
+def wait_for(condition, timeout=3):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def collector():
+    transcripts = []
+    final = threading.Event()
+
+    def on_transcript(client, result, **kwargs):
+        transcripts.append(result.channel.alternatives[0].transcript)
+        if result.speech_final:
+            final.set()
+    return transcripts, final, on_transcript
+
+
+def test_acquire_and_release_reuse_one_socket(server, manager):
+    for _ in range(3):
+        connection = manager.acquire(collector()[2])
+        assert connection is not None and connection.is_connected()
+        connection.send(b"\0" * 320)
+        manager.release()
+    assert server.audio_received.wait(1)
+    assert server.connections == 1
+    assert manager.connects == 1 and manager.reuses == 2
+
+
+def test_transcripts_go_only_to_the_current_handler(server, manager):
+    first, first_final, on_first = collector()
+    manager.acquire(on_first)
+    server.say("hello pixie")
+    assert first_final.wait(2)
+    manager.release()
+
+    second, second_final, on_second = collector()
+    manager.acquire(on_second)
+    server.say("what time is it")
+    assert second_final.wait(2)
+    assert first == ["hello", "hello pixie", "hello pixie"]
+    assert second[-1] == "what time is it"
+    assert not any("pixie" in text for text in second)
+
+
+def test_results_after_release_are_dropped(server, manager):
+    transcripts, final, on_transcript = collector()
+    manager.acquire(on_transcript)
+    manager.release()
+    server.say("nobody is listening")
+    time.sleep(0.1)
+    assert transcripts == []
+    assert manager.is_connected()
+
+
+def test_keep_alive_is_sent_while_idle(server, manager, monkeypatch):
+    # The SDK sends a KeepAlive every DEEPGRAM_INTERVAL seconds; shorten it so the test stays quick
+    monkeypatch.setattr(listen_client, "DEEPGRAM_INTERVAL", 1)
+    manager.acquire(collector()[2])
+    manager.release()
+    wait_for(lambda: server.keepalives >= 1)
+    assert manager.is_connected()
+    assert server.connections == 1
+
+
+def test_reconnects_after_the_server_closes_the_socket(server, manager):
+    manager.acquire(collector()[2])
+    manager.release()
+    server.disconnect()
+    wait_for(lambda: not manager.is_connected())
+
+    transcripts, final, on_transcript = collector()
+    connection = manager.acquire(on_transcript)
+    assert connection is not None and connection.is_connected()
+    assert server.connections == 2 and manager.connects == 2
+    server.say("back again")
+    assert final.wait(2)
+    assert transcripts[-1] == "back again"
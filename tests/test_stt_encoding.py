@@ -0,0 +1,135 @@
+import struct
+import sys
+import warnings
+import numpy as np
+from stt_encoding import (MULAW_BIAS, OPUS_PRE_SKIP, EncodingSender, OggWriter, OpusEncoder, create_encoder,
+                          mulaw_encode, ogg_crc)
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import audioop
+except ImportError:  # Removed in Python 3.13
+    audioop = None
+
+
+def mulaw_decode(data):
+    # G.711 reference decode, for Pythons without audioop
+    codes = ~np.frombuffer(data, dtype=np.uint8) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    magnitude = ((((codes & 0x0F).astype(np.int32) << 3) + MULAW_BIAS) << exponent) - MULAW_BIAS
+    return np.where(codes & 0x80, -magnitude, magnitude)
+
+
+def reference_decode(data):
+    if audioop is not None:
+        return np.frombuffer(audioop.ulaw2lin(data, 2), dtype=np.int16).astype(np.int32)
+    return mulaw_decode(data)
+
+
+class FakePacketEncoder:
+    """opuslib.Encoder look-alike returning packets of fixed sizes."""
+
+    def __init__(self, sizes):
+        self.sizes = list(sizes)
+        self.calls = []
+
+    def encode(self, pcm, frame_size):
+        self.calls.append((len(pcm), frame_size))
+        return bytes([len(self.calls)]) * self.sizes[(len(self.calls) - 1) % len(self.sizes)]
+
+
+def parse_pages(data):
+    pages = []
+    while data:
+        assert data[:4] == b"OggS"
+        header_type, granule, serial, sequence, crc, segments = struct.unpack_from("<BqIIIB", data, 5)
+        lacing = list(data[27:27 + segments])
+        size = 27 + segments + sum(lacing)
+        page = data[:size]
+        pages.append({"header_type": header_type, "granule": granule, "sequence": sequence, "crc": crc,
+                      "lacing": lacing, "body": page[27 + segments:], "raw": page})
+        data = data[size:]
+    return pages
+
+
+def test_ogg_crc_matches_the_reference_check_value():
+    # CRC-32 with polynomial 0x04C11DB7, no reflection, zero init and xorout
+    assert ogg_crc(b"123456789") == 0x89A1897F
+
+
+def test_page_crc_covers_the_page_with_a_zeroed_checksum():
+    page = OggWriter().page([b"hello", b"x" * 300], granule=960)
+    parsed = parse_pages(page)[0]
+    zeroed = page[:22] + b"\0\0\0\0" + page[26:]
+    assert parsed["crc"] == ogg_crc(zeroed)
+
+
+def test_lacing_splits_packets_of_255_bytes_and_more():
+    packets = [b"a" * 254, b"b" * 255, b"c" * 600, b""]
+    parsed = parse_pages(OggWriter().page(packets, granule=0))[0]
+    assert parsed["lacing"] == [254, 255, 0, 255, 255, 90, 0]
+    assert parsed["body"] == b"".join(packets)
+
+
+def test_opus_pages_advance_the_granule_by_the_frame_size():
+    packet_encoder = FakePacketEncoder([40, 300])
+    encoder = OpusEncoder(sample_rate=16000, packet_encoder=packet_encoder)
+    chunk = b"\0" * encoder.frame_size * 2 * 3
+    pages = parse_pages(encoder.encode(chunk) + encoder.encode(chunk[:encoder.frame_size * 2]))
+
+    # OpusHead and OpusTags first, then one page per encode() call
+    assert pages[0]["body"].startswith(b"OpusHead") and pages[0]["header_type"] == 0x02
+    assert pages[1]["body"].startswith(b"OpusTags")
+    assert [page["sequence"] for page in pages] == [0, 1, 2, 3]
+    assert packet_encoder.calls == [(encoder.frame_size * 2, encoder.frame_size)] * 4
+    # 20 ms frames at 16 kHz are 960 samples at Ogg Opus' 48 kHz granule rate
+    assert pages[2]["granule"] == OPUS_PRE_SKIP + 3 * 960
+    assert pages[3]["granule"] == OPUS_PRE_SKIP + 4 * 960
+    assert pages[2]["lacing"] == [40, 255, 45, 40]
+    for page in pages:
+        assert page["crc"] == ogg_crc(page["raw"][:22] + b"\0\0\0\0" + page["raw"][26:])
+
+
+def test_opus_encode_ignores_a_partial_frame():
+    encoder = OpusEncoder(sample_rate=16000, packet_encoder=FakePacketEncoder([10]))
+    assert encoder.encode(b"\0" * (encoder.frame_size * 2 - 2)) == b""
+    assert encoder.align(encoder.frame_size * 5 + 7) == encoder.frame_size * 5
+    assert encoder.align(1) == encoder.frame_size
+
+
+def test_mulaw_round_trips_within_one_quantisation_step():
+    samples = np.concatenate([np.arange(-32768, 32768, 7), [-32768, -1, 0, 1, 32767]]).astype(np.int16)
+    decoded = reference_decode(mulaw_encode(samples))
+    clipped = np.clip(samples.astype(np.int32), -32635, 32635)
+    # The step doubles with each mu-law segment: 8 in the first, 1024 in the last
+    magnitude = np.abs(clipped) + MULAW_BIAS
+    step = 1 << (np.floor(np.log2(magnitude)).astype(np.int32) - 4)
+    assert np.all(np.abs(decoded - clipped) <= step)
+
+
+def test_sender_falls_back_to_linear16_without_opuslib(monkeypatch):
+    monkeypatch.setitem(sys.modules, "opuslib", None)  # Makes "import opuslib" raise ImportError
+    encoder = create_encoder("opus")
+    assert encoder is None
+
+    sent = []
+    sender = EncodingSender(sent.append, encoder)
+    pcm = np.arange(320, dtype=np.int16).tobytes()
+    sender.feed(pcm)
+    sender.close()
+    assert sender.encoding == "linear16"
+    assert sent == [pcm]
+    assert sender.bytes_in == sender.bytes_out == len(pcm)
+
+
+def test_control_messages_stay_in_order_with_the_audio():
+    sent = []
+    sender = EncodingSender(sent.append, create_encoder("mulaw"))
+    pcm = np.zeros(160, dtype=np.int16).tobytes()
+    sender.feed(pcm)
+    sender.control(lambda: sent.append("finalize"))
+    sender.feed(pcm)
+    sender.close()
+    assert sender.encoding == "mulaw"
+    assert [len(item) if isinstance(item, bytes) else item for item in sent] == [160, "finalize", 160]
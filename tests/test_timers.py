@@ -0,0 +1,71 @@
+import threading
+import time
+from fakes import FakeClock
+from timers import DeadlineTimer
+
+
+def make_timer(timeout=2.0):
+    clock = FakeClock(100.0)
+    fired = []
+    return DeadlineTimer(timeout, lambda: fired.append(clock()), clock=clock), clock, fired
+
+
+def test_fires_once_the_deadline_passes():
+    timer, clock, fired = make_timer()
+    timer.touch()
+    assert timer.armed
+    clock.advance(1.9)
+    assert not timer.fire_if_due()
+    clock.advance(0.1)
+    assert timer.fire_if_due()
+    assert fired == [102.0]
+    assert not timer.armed
+    clock.advance(10)
+    assert not timer.fire_if_due()  # Fires once per touch
+    assert fired == [102.0]
+
+
+def test_touch_pushes_the_deadline_back():
+    timer, clock, fired = make_timer()
+    timer.touch()
+    clock.advance(1.5)
+    timer.touch()
+    clock.advance(1.5)
+    assert not timer.fire_if_due()
+    clock.advance(0.5)
+    assert timer.fire_if_due()
+    assert fired == [103.5]
+
+
+def test_cancel_disarms():
+    timer, clock, fired = make_timer()
+    timer.touch()
+    timer.cancel()
+    assert not timer.armed
+    clock.advance(5)
+    assert not timer.fire_if_due()
+    assert fired == []
+
+
+def test_idle_timer_never_fires():
+    timer, clock, fired = make_timer()
+    clock.advance(100)
+    assert not timer.fire_if_due()
+    assert fired == []
+
+
+def test_worker_thread_fires_and_stops():
+    fired = threading.Event()
+    timer = DeadlineTimer(0.05, fired.set)
+    timer.start()
+    try:
+        timer.touch()
+        assert fired.wait(1)
+        fired.clear()
+        timer.touch()
+        timer.cancel()
+        time.sleep(0.1)
+        assert not fired.is_set()
+    finally:
+        timer.stop()
+    assert not timer.armed
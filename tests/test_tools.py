@@ -0,0 +1,104 @@
+import threading
+import time
+from tools import ToolDispatcher, ToolResult, parse_tags, tool_context
+
+
+def sleeping_tool(seconds, text):
+    def tool(arg, query, timeout):
+        time.sleep(seconds)
+        return f"{text} {arg}" if arg else text
+    return tool
+
+
+def test_parse_tags_keeps_order_and_drops_duplicates():
+    assert parse_tags("[GET_WEATHER=Paris][GET_EMAIL][GET_WEATHER=Paris]") == [("GET_WEATHER", "Paris"), ("GET_EMAIL", None)]
+
+
+def test_tools_run_in_parallel():
+    dispatcher = ToolDispatcher(workers=4, timeout=2.0)
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def tool(arg, query, timeout):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.2)
+        with lock:
+            running[0] -= 1
+        return arg
+
+    for tag in ("A", "B", "C"):
+        dispatcher.register(tag, tool)
+    start = time.monotonic()
+    results = dispatcher.run([("A", "1"), ("B", "2"), ("C", "3")], "query")
+    elapsed = time.monotonic() - start
+    dispatcher.shutdown()
+
+    assert [result.text for result in results] == ["1", "2", "3"]
+    assert peak[0] == 3
+    assert elapsed < 0.4  # Three 0.2 s tools one after another would take 0.6 s
+
+
+def test_each_tool_gets_its_own_deadline():
+    dispatcher = ToolDispatcher(workers=4)
+    dispatcher.register("FAST", sleeping_tool(0.05, "fast"), timeout=0.5)
+    dispatcher.register("SLOW", sleeping_tool(1.0, "slow"), timeout=0.2)
+    dispatcher.register("MEDIUM", sleeping_tool(0.3, "medium"), timeout=0.5)
+    start = time.monotonic()
+    results = dispatcher.run([("SLOW", None), ("FAST", None), ("MEDIUM", None)], "query")
+    elapsed = time.monotonic() - start
+    dispatcher.shutdown()
+
+    # The slow tool times out without holding up the others, which still get their own deadline
+    assert [result.tag for result in results] == ["FAST", "MEDIUM"]
+    assert elapsed < 0.45
+    assert dispatcher.stats() == {"calls": 3, "timeouts": 1, "errors": 0}
+
+
+def test_tools_are_told_how_long_they_have():
+    timeouts = []
+    dispatcher = ToolDispatcher()
+    dispatcher.register("A", lambda arg, query, timeout: timeouts.append(timeout) or "a", timeout=0.5)
+    dispatcher.run([("A", None)], "query")
+    dispatcher.shutdown()
+    assert 0.4 < timeouts[0] <= 0.5
+
+
+def test_failing_and_unknown_tools_are_dropped():
+    def broken(arg, query, timeout):
+        raise RuntimeError("scrape failed")
+
+    dispatcher = ToolDispatcher()
+    dispatcher.register("BROKEN", broken)
+    dispatcher.register("OK", sleeping_tool(0, "ok"))
+    results = dispatcher.run([("BROKEN", None), ("UNKNOWN", None), ("OK", None)], "query")
+    dispatcher.shutdown()
+
+    assert [result.tag for result in results] == ["OK"]
+    assert dispatcher.stats() == {"calls": 2, "timeouts": 0, "errors": 1}
+
+
+def test_counters_are_exact_under_concurrent_runs():
+    dispatcher = ToolDispatcher(workers=8, timeout=2.0)
+    dispatcher.register("GET_WEATHER", lambda arg, query, timeout: "sunny")
+    dispatcher.register("GET_EMAIL", lambda arg, query, timeout: 1 / 0)
+
+    def run():
+        for _ in range(50):
+            dispatcher.run([("GET_WEATHER", None), ("GET_EMAIL", None)], "query")
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert dispatcher.stats() == {"calls": 800, "timeouts": 0, "errors": 400}
+    finally:
+        dispatcher.shutdown()
+
+
+def test_tool_context_keeps_tag_order():
+    context = tool_context([ToolResult("GET_WEATHER", "Paris", "Sunny, 20C", 0.1), ToolResult("WEB_SEARCH", None, "Paris is in France.", 0.2)])
+    assert context.index("[GET_WEATHER=Paris]\nSunny, 20C") < context.index("[WEB_SEARCH]\nParis is in France.")
+    assert tool_context([]) is None
@@ -0,0 +1,37 @@
+from fakes import FakeClock
+from tracing import Tracer
+
+
+def test_marks_count_from_the_turn_start_or_an_earlier_mark():
+    clock = FakeClock()
+    tracer = Tracer(enabled=True, clock=clock)
+    tracer.begin_turn("wake")
+    clock.now = 0.5
+    tracer.mark("first_interim")
+    clock.now = 1.5
+    tracer.mark("stt_final")
+    clock.now = 2.1
+    tracer.mark("playback_first_write")
+    tracer.mark("final_to_first_audio", since="stt_final")
+
+    assert tracer.percentiles("first_interim")[50] == 500
+    assert tracer.percentiles("stt_final")[50] == 1500
+    assert round(tracer.percentiles("playback_first_write")[50]) == 2100
+    assert round(tracer.percentiles("final_to_first_audio")[50]) == 600
+
+
+def test_marks_do_not_carry_over_to_the_next_turn():
+    clock = FakeClock()
+    tracer = Tracer(enabled=True, clock=clock)
+    tracer.begin_turn()
+    tracer.mark("stt_final")
+    tracer.begin_turn()
+    tracer.mark("final_to_first_audio", since="stt_final")
+    assert tracer.percentiles("final_to_first_audio") is None
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    tracer.begin_turn()
+    tracer.mark("stt_final")
+    assert tracer.stats() == {}
@@ -0,0 +1,62 @@
+import threading
+import time
+import pytest
+from fakes import CHARS_PER_SECOND, FakeDeepgramSpeakServer, tone
+from tts_backends import DeepgramSDKBackend, DeepgramSpeakBackend
+
+SAMPLE_RATE = 16000
+
+
+@pytest.fixture
+def server():
+    server = FakeDeepgramSpeakServer(sample_rate=SAMPLE_RATE, rtf=0.05, first_audio_delay=0.01).start()
+    yield server
+    server.stop()
+
+
+BACKENDS = {
+    "deepgram": lambda server: DeepgramSpeakBackend(api_key="fake", sample_rate=SAMPLE_RATE, url=server.url),
+    "deepgram-sdk": lambda server: DeepgramSDKBackend(api_key="fake", sample_rate=SAMPLE_RATE, url=server.http_url),
+}
+
+
+@pytest.mark.parametrize("name", sorted(BACKENDS))
+def test_interrupted_stream_audio_does_not_reach_the_next_stream(server, name):
+    backend = BACKENDS[name](server)
+    try:
+        # Barge-in: the first reply is closed without a flush while the server is still rendering it
+        started = threading.Event()
+        interrupted = backend.open_stream(lambda data: started.set())
+        interrupted.synthesize("This reply is long enough to still be playing when the user interrupts it. " * 4)
+        assert started.wait(5)
+        interrupted.close()
+
+        received = []
+        text = "A short answer."
+        stream = backend.open_stream(received.append)
+        stream.synthesize(text)
+        stream.flush()
+        stream.close()
+        time.sleep(0.2)  # Anything still arriving would belong to the interrupted reply
+
+        samples = sum(len(packet) for packet in received) // 2
+        assert samples == len(tone(len(text) / CHARS_PER_SECOND, SAMPLE_RATE))
+        assert backend.clears == server.clears == 1
+        assert server.connections == 1
+    finally:
+        backend.delete()
+
+
+def test_flushed_stream_is_not_cleared(server):
+    backend = DeepgramSpeakBackend(api_key="fake", sample_rate=SAMPLE_RATE, url=server.url)
+    try:
+        for _ in range(2):
+            received = []
+            stream = backend.open_stream(received.append)
+            stream.synthesize("Hello there.")
+            stream.flush()
+            stream.close()
+            assert received
+        assert backend.clears == server.clears == 0
+    finally:
+        backend.delete()
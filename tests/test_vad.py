@@ -0,0 +1,120 @@
+import threading
+import time
+import numpy as np
+from audio_output import AudioOutput, NullStream
+from fakes import FakeOrca
+from tts_backends import OrcaBackend
+from tts_manager import TTSManager
+from vad import BargeInMonitor, EnergyVAD
+
+FRAME = 160
+
+
+def frame(level, index=0):
+    # The first sample tags the frame so the order it was sent in can be checked
+    samples = np.full(FRAME, level, dtype=np.int16)
+    samples[0] = index
+    return samples.tobytes()
+
+
+def make_monitor(position=1000, preroll_frames=8):
+    sent, interruptions = [], []
+    monitor = BargeInMonitor(sent.append, lambda: interruptions.append(True), vad=EnergyVAD(500, 2),
+                             preroll_frames=preroll_frames, position=position)
+    return monitor, sent, interruptions
+
+
+def test_disarmed_monitor_passes_audio_through():
+    monitor, sent, interruptions = make_monitor()
+    for level in (0, 1000, 1000, 1000):
+        monitor.feed(frame(level))
+    assert len(sent) == 4
+    assert not interruptions
+
+
+def test_echo_is_held_and_dropped_on_disarm():
+    monitor, sent, interruptions = make_monitor()
+    monitor.arm()
+    for _ in range(5):
+        monitor.feed(frame(100))  # Quieter than the VAD threshold, like Pixie's own echo
+    monitor.disarm()
+    monitor.feed(frame(0))
+    assert sent == [frame(0)]
+    assert not interruptions
+
+
+def test_speech_flushes_the_held_frames_in_order():
+    monitor, sent, interruptions = make_monitor()
+    monitor.arm()
+    frames = [frame(0, 1), frame(1000, 2), frame(1000, 3)]
+    for data in frames:
+        monitor.feed(data)
+    assert interruptions == [True]
+    assert sent == frames
+    monitor.feed(frame(900, 4))
+    assert sent == frames + [frame(900, 4)]  # Disarmed by the barge-in
+
+
+def test_only_the_last_preroll_frames_are_flushed():
+    monitor, sent, _ = make_monitor(preroll_frames=2)
+    monitor.arm()
+    for index in range(4):
+        monitor.feed(frame(100, index))
+    monitor.feed(frame(1000, 4))
+    monitor.feed(frame(1000, 5))
+    assert sent == [frame(1000, 4), frame(1000, 5)]
+
+
+def test_arm_at_holds_from_that_capture_position_on():
+    monitor, sent, interruptions = make_monitor(position=1000)
+    monitor.arm(at=1000 + 2 * FRAME)
+    monitor.feed(frame(1000, 1))
+    monitor.feed(frame(1000, 2))
+    assert sent == [frame(1000, 1), frame(1000, 2)]
+    monitor.feed(frame(100, 3))
+    monitor.feed(frame(100, 4))
+    assert len(sent) == 2
+    assert not interruptions
+    monitor.feed(frame(1000, 5))
+    monitor.feed(frame(1000, 6))
+    assert interruptions == [True]
+    assert sent == [frame(1000, index) for index in (1, 2)] + [frame(100, 3), frame(100, 4), frame(1000, 5), frame(1000, 6)]
+
+
+def test_barge_in_stops_a_playing_reply_and_flushes_to_stt(tmp_path):
+    output = AudioOutput(output_stream=NullStream)
+    tts = TTSManager(lambda: OrcaBackend(None, engine=FakeOrca(rtf=0.01)), pcm_cache_dir=str(tmp_path), output=output)
+    stt = []
+    interrupted = []
+
+    def on_barge_in():
+        interrupted.append(time.monotonic())
+        tts.interrupt()
+
+    monitor = BargeInMonitor(stt.append, on_barge_in, vad=EnergyVAD(500, 3), preroll_frames=8)
+    try:
+        tts.start_stream()
+        tts.feed("This reply is long enough to still be playing when the user starts talking over it.")
+        tts.end_stream()
+        monitor.arm()
+        deadline = time.monotonic() + 2
+        while output._stream is None or output._stream.frames == 0:
+            assert time.monotonic() < deadline, "the reply never started playing"
+            time.sleep(0.005)
+
+        speech = [frame(100, 1), frame(100, 2)] + [frame(2000, index) for index in range(3, 8)]
+        for data in speech:
+            monitor.feed(data)
+
+        assert tts.source.wait(0.1)
+        stopped = output._stream.frames
+        time.sleep(0.1)
+        # At most the block that was being written when the reply stopped
+        assert output._stream.frames - stopped <= output.block_size
+        assert not output.is_playing()
+        assert len(interrupted) == 1
+        # The frames held back while the reply played, then the rest, in the order they were captured
+        assert stt == speech
+    finally:
+        tts.cleanup()
+        output.close()
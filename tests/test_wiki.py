@@ -0,0 +1,89 @@
+import time
+import pytest
+from fakes import FakeWikipedia
+from wiki import SummaryIndex, WikipediaLookup
+
+PAGES = {
+    "Black hole": "A black hole is a region of spacetime where gravity is so strong that nothing can escape.",
+    "Event horizon": "In astrophysics, an event horizon is a boundary around a black hole.",
+    "Hole": "A hole is an opening in or through a particular medium.",
+    "Hawking radiation": "Hawking radiation is thermal radiation released outside a black hole's event horizon.",
+    "Slow page": "A page that takes too long to load.",
+}
+SEARCH = {"what is a black hole": ["Black hole", "Hole", "Missing page", "Event horizon", "Hawking radiation"]}
+
+
+@pytest.fixture
+def lookups():
+    created = []
+
+    def make(wikipedia, **kwargs):
+        lookup = WikipediaLookup(wikipedia, index=SummaryIndex(":memory:"), **kwargs)
+        created.append(lookup)
+        return lookup
+
+    yield make
+    for lookup in created:
+        lookup.executor.shutdown(wait=False, cancel_futures=True)
+        lookup.index.close()
+
+
+def test_pages_are_fetched_concurrently_up_to_the_worker_limit(lookups):
+    wikipedia = FakeWikipedia(PAGES, search_results=SEARCH, disambiguations={"Hole"}, delay=0.2)
+    lookup = lookups(wikipedia, workers=2, deadline=5)
+    start = time.monotonic()
+    found = lookup.lookup("what is a black hole")
+    elapsed = time.monotonic() - start
+
+    # Disambiguations and missing pages are left out; the rest keep search order
+    assert [title for title, _ in found] == ["Black hole", "Event horizon", "Hawking radiation"]
+    assert wikipedia.max_active == 2
+    assert wikipedia.page_requests == 5
+    assert elapsed < 0.2 + 3 * 0.2 + 0.15  # Search, then five pages two at a time rather than 1.2 s in a row
+
+
+def test_slow_pages_are_dropped_at_the_deadline_and_indexed_later(lookups):
+    wikipedia = FakeWikipedia(PAGES, search_results={"black hole": ["Black hole", "Slow page"]},
+                              delay=0.05, delays={"Slow page": 1.0})
+    lookup = lookups(wikipedia, deadline=0.5)
+    start = time.monotonic()
+    found = lookup.lookup("black hole")
+    elapsed = time.monotonic() - start
+
+    assert [title for title, _ in found] == ["Black hole"]
+    assert 0.45 < elapsed < 0.65
+    assert lookup.late_pages == 1
+    time.sleep(0.7)
+    assert lookup.index.get("Slow page") is not None
+
+
+def test_search_past_the_deadline_returns_nothing(lookups):
+    wikipedia = FakeWikipedia(PAGES, delay=1.0)
+    lookup = lookups(wikipedia, deadline=0.5)
+    start = time.monotonic()
+    assert lookup.lookup("black hole") == []
+    assert time.monotonic() - start < 0.65
+
+
+def test_repeat_query_is_answered_from_the_index(lookups):
+    wikipedia = FakeWikipedia(PAGES, search_results=SEARCH, disambiguations={"Hole"}, delay=0.05)
+    lookup = lookups(wikipedia, deadline=2)
+    first = lookup.lookup("what is a black hole")
+    searches, page_requests = wikipedia.searches, wikipedia.page_requests
+
+    start = time.monotonic()
+    repeat = lookup.lookup("What is a black hole?")
+    assert time.monotonic() - start < 0.05
+    assert repeat == first
+    assert (wikipedia.searches, wikipedia.page_requests) == (searches, page_requests)
+    assert (lookup.index_hits, lookup.network_lookups) == (1, 1)
+
+
+def test_similar_query_matches_indexed_summaries(lookups):
+    wikipedia = FakeWikipedia(PAGES, search_results=SEARCH, disambiguations={"Hole"}, delay=0.05)
+    lookup = lookups(wikipedia, deadline=2)
+    lookup.lookup("what is a black hole")
+
+    found = lookup.lookup("tell me about event horizons")
+    assert found[0][0] == "Event horizon"
+    assert wikipedia.searches == 1
@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class DeadlineTimer:
+    """Runs callback once a re-armable deadline passes.
+
+    The worker thread sleeps on a condition variable until the deadline or
+    until touch()/cancel() changes it, so an idle timer never wakes up.
+    Tests can pass a fake clock and call fire_if_due() without start().
+    """
+
+    def __init__(self, timeout, callback, clock=time.monotonic):
+        self.timeout = timeout
+        self.callback = callback
+        self.clock = clock
+        self._deadline = None
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def touch(self):
+        """(Re-)arm the timer to fire timeout seconds from now."""
+        with self._cond:
+            self._deadline = self.clock() + self.timeout
+            self._cond.notify()
+
+    def cancel(self):
+        with self._cond:
+            self._deadline = None
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._deadline = None
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def armed(self):
+        return self._deadline is not None
+
+    def fire_if_due(self):
+        """Run the callback if the deadline has passed; returns True if it ran."""
+        with self._cond:
+            if self._deadline is None or self.clock() < self._deadline:
+                return False
+            self._deadline = None
+        self.callback()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                if self._deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = self._deadline - self.clock()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+            self.fire_if_due()
@@ -0,0 +1,105 @@
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+TOOL_WORKERS = 4
+TOOL_TIMEOUT = 4.0
+
+TAG_RE = re.compile(r"\[([A-Z_]+)(?:=([^\]]*))?\]")
+
+ToolResult = namedtuple("ToolResult", ["tag", "arg", "text", "elapsed"])
+
+
+def parse_tags(response):
+    """[(tag, argument or None)] from an intent response like "[GET_WEATHER=Paris][GET_EMAIL]", in order."""
+    tags = []
+    for name, arg in TAG_RE.findall(response):
+        tag = (name, arg.strip() or None)
+        if tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def format_tag(tag, arg):
+    return f"[{tag}]" if arg is None else f"[{tag}={arg}]"
+
+
+class ToolDispatcher:
+    """Runs every tool an intent asks for at the same time, each against its own deadline.
+
+    A tool is tool(arg, query, timeout) -> text or None, registered under
+    its tag; timeout is the seconds left before its deadline, so the tool
+    can stop its own work in time, since a running thread can't be
+    cancelled from outside. Results come back in the order the tags were
+    asked for; a tool that errors or misses its deadline is dropped from
+    them, so the answer can go out without it. Tags with no registered tool
+    are ignored.
+    """
+
+    def __init__(self, workers=TOOL_WORKERS, timeout=TOOL_TIMEOUT):
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool")
+        self.tools = {}
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self._lock = threading.Lock()  # run() can be called from several threads at once
+
+    def register(self, tag, tool, timeout=None):
+        self.tools[tag] = (tool, self.timeout if timeout is None else timeout)
+
+    def handles(self, tags):
+        return any(tag in self.tools for tag, _ in tags)
+
+    def _call(self, tool, arg, query, end):
+        start = time.monotonic()
+        return tool(arg, query, max(end - start, 0)), time.monotonic() - start
+
+    def run(self, tags, query):
+        """[ToolResult] for the registered tools among tags, in tag order, within each tool's timeout."""
+        start = time.monotonic()
+        pending = []
+        for tag, arg in tags:
+            if tag in self.tools:
+                tool, timeout = self.tools[tag]
+                future = self.executor.submit(self._call, tool, arg, query, start + timeout)
+                pending.append((tag, arg, timeout, future))
+                with self._lock:
+                    self.calls += 1
+
+        results = []
+        for tag, arg, timeout, future in pending:
+            # Deadlines count from the start, so waiting on one tool doesn't eat into the next
+            try:
+                text, elapsed = future.result(timeout=max(start + timeout - time.monotonic(), 0))
+            except TimeoutError:
+                future.cancel()
+                with self._lock:
+                    self.timeouts += 1
+                print(f"[tools] {format_tag(tag, arg)} missed its {timeout:.1f}s deadline")
+                continue
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"[tools] {format_tag(tag, arg)} failed: {e}")
+                continue
+            if text:
+                results.append(ToolResult(tag, arg, text, elapsed))
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "timeouts": self.timeouts, "errors": self.errors}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def tool_context(results):
+    """Tool results as one block of context for the LLM, in the order the query asked for them."""
+    if not results:
+        return None
+    sections = [f"{format_tag(result.tag, result.arg)}\n{result.text.strip()}" for result in results]
+    return "Use this information from Pixie's tools to answer the user:\n\n" + "\n\n".join(sections)
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from queue import Queue
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+_NO_SPAN = nullcontext()
+
+
+class Tracer:
+    """Per-turn latency spans on a monotonic clock.
+
+    A turn starts with begin_turn(); mark(name) records the time since the
+    turn started, or since an earlier mark of the turn, and record(name,
+    start) and span(name) the time a stage took.
+    Every span is appended to a JSONL file by a writer thread and kept in a
+    rolling window for percentiles. A disabled tracer returns before doing
+    any work, so the calls can stay in the hot paths.
+    """
+
+    def __init__(self, path=None, enabled=None, window=500, clock=time.monotonic):
+        self.path = path
+        self.enabled = bool(path) if enabled is None else enabled
+        self.window = window
+        self.clock = clock
+        self.turn = 0
+        self.turn_start = None
+        self._marks = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._queue = None
+        self._writer = None
+        if self.enabled and path:
+            self._queue = Queue()
+            self._writer = threading.Thread(target=self._write, args=(path,), daemon=True)
+            self._writer.start()
+
+    def now(self):
+        return self.clock()
+
+    def begin_turn(self, name="turn"):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.turn += 1
+            self.turn_start = self.clock()
+            self._marks = {}
+        self._emit({"turn": self.turn, "span": name, "start_ms": 0.0, "ms": 0.0})
+
+    def mark(self, name, since=None):
+        """Record the time from the start of the current turn, or from its mark since, to now."""
+        if not self.enabled:
+            return
+        now = self.clock()
+        with self._lock:
+            start = self.turn_start if since is None else self._marks.get(since)
+            self._marks.setdefault(name, now)
+        self.record(name, start, now)
+
+    def record(self, name, start, end=None):
+        if not self.enabled or start is None:
+            return
+        if end is None:
+            end = self.clock()
+        duration = (end - start) * 1000
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(duration)
+            turn, turn_start = self.turn, self.turn_start
+        offset = round((start - turn_start) * 1000, 1) if turn_start is not None else None
+        self._emit({"turn": turn, "span": name, "start_ms": offset, "ms": round(duration, 1)})
+
+    def span(self, name):
+        if not self.enabled:
+            return _NO_SPAN
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def percentiles(self, name):
+        with self._lock:
+            samples = list(self._samples.get(name, ()))
+        if not samples:
+            return None
+        return dict(zip(PERCENTILES, np.percentile(samples, PERCENTILES)))
+
+    def stats(self):
+        with self._lock:
+            names = list(self._samples)
+        return {name: {"count": len(self._samples[name]), **self.percentiles(name)} for name in names}
+
+    def report(self):
+        lines = [f"{'span':<24}{'count':>6}" + "".join(f"{'p' + str(p):>9}" for p in PERCENTILES)]
+        for name, stats in self.stats().items():
+            lines.append(f"{name:<24}{stats['count']:>6}" + "".join(f"{stats[p]:>7.0f}ms" for p in PERCENTILES))
+        return "\n".join(lines)
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _emit(self, event):
+        if self._queue is not None:
+            self._queue.put(event)
+
+    def _write(self, path):
+        # File I/O stays off the audio and network threads
+        with open(path, "a") as f:
+            while True:
+                event = self._queue.get()
+                if event is None:
+                    return
+                f.write(json.dumps(event) + "\n")
+                if self._queue.empty():
+                    f.flush()
@@ -2,18 +2,13 @@ import json
 import os
 import threading
 import sys
-import queue
 import asyncio
-import pyaudio
 from groq import Groq
 from websockets.sync.client import connect
+from audio_output import shared_output
 
 # Constants
-TIMEOUT = 0.050
-FORMAT = pyaudio.paInt16
-CHANNELS = 1
 RATE = 48000
-CHUNK = 8000
 
 # Environment Variables
 DEEPGRAM_URL = f"wss://api.deepgram.com/v1/speak?encoding=linear16&sample_rate={RATE}"
@@ -21,41 +16,25 @@ DEEPGRAM_TOKEN = os.getenv("DEEPGRAM_API_KEY")
 GROQ_TOKEN = os.getenv("GROQ_API_KEY")
 
 class Speaker:
-    """Class to handle audio playback."""
-    def __init__(self, rate=RATE, chunk=CHUNK, channels=CHANNELS):
-        self._exit = threading.Event()
-        self._queue = queue.Queue()
-        self._audio = pyaudio.PyAudio()
-        self._stream = self._audio.open(
-            format=FORMAT, channels=channels, rate=rate, output=True,
-            frames_per_buffer=chunk
-        )
+    """Class to handle audio playback on the shared output engine."""
+    def __init__(self, rate=RATE, output=None):
+        self._rate = rate
+        self._output = output or shared_output()
+        self._source = None
         self.playback_finished = threading.Event()
 
     def start(self):
         """Start audio playback."""
-        threading.Thread(target=self._play, daemon=True).start()
+        self._source = self._output.open_source(self._rate, queue=True)
+        self.playback_finished = self._source.idle
 
     def stop(self):
         """Stop audio playback."""
-        self._exit.set()
-        self._stream.stop_stream()
-        self._stream.close()
+        self._source.end()
 
     def play(self, data):
         """Queue audio data for playback."""
-        self._queue.put(data)
-
-    def _play(self):
-        """Play queued audio."""
-        while not self._exit.is_set():
-            try:
-                data = self._queue.get(timeout=TIMEOUT)
-                self._stream.write(data)
-            except queue.Empty:
-                if self._queue.empty():
-                    self.playback_finished.set()
-                continue
+        self._source.write(data)
 
 print(f"Connecting to {DEEPGRAM_URL}")
 
@@ -0,0 +1,298 @@
+import json
+import os
+import threading
+import numpy as np
+from audio_buffer import PCMRingBuffer
+
+DEEPGRAM_SPEAK_URL = "wss://api.deepgram.com/v1/speak"
+DEEPGRAM_MODEL = "aura-asteria-en"
+DEEPGRAM_SAMPLE_RATE = 48000
+FLUSH_TIMEOUT = 10
+CLEAR_TIMEOUT = 2
+
+
+def collect_pcm(packets):
+    """Join queued PCM packets (bytes or int16 lists) into a single packet."""
+    if not packets:
+        return None
+    if all(isinstance(packet, (bytes, bytearray)) for packet in packets):
+        return b"".join(packets)
+    return np.concatenate([PCMRingBuffer.to_int16(packet) for packet in packets])
+
+
+class TTSBackend:
+    """Streaming text-to-speech engine used by TTSManager.
+
+    open_stream(on_audio) returns a session shaped like Orca's stream:
+    synthesize(text) and flush() return int16 PCM at sample_rate or None,
+    and close() ends the session. Backends that receive audio on their own
+    thread pass it to on_audio as it arrives instead; their flush() returns
+    once all audio for the session has been delivered.
+    """
+
+    name = None
+    voice = "default"
+    sample_rate = None
+
+    def open_stream(self, on_audio):
+        raise NotImplementedError
+
+    def synthesize(self, text):
+        """Synthesize a whole phrase at once; used to fill the PCM cache."""
+        packets = []
+        stream = self.open_stream(packets.append)
+        try:
+            packets.append(stream.synthesize(text))
+            packets.append(stream.flush())
+        finally:
+            stream.close()
+        return collect_pcm([packet for packet in packets if packet is not None])
+
+    def delete(self):
+        pass
+
+
+class OrcaBackend(TTSBackend):
+    """Picovoice Orca, synthesizing locally at 22050 Hz."""
+
+    name = "orca"
+
+    def __init__(self, access_key, model_path=None, engine=None):
+        if engine is None:
+            import pvorca
+            engine = pvorca.create(access_key=access_key, model_path=model_path)
+        self.orca = engine
+        self.voice = os.path.basename(model_path) if model_path else "default"
+        self.sample_rate = self.orca.sample_rate
+
+    def open_stream(self, on_audio):
+        return self.orca.stream_open()
+
+    def synthesize(self, text):
+        return self.orca.synthesize(text)[0]
+
+    def delete(self):
+        if self.orca is not None:
+            self.orca.delete()
+            self.orca = None
+
+
+class _PushStream:
+    """Orca-shaped session for a websocket whose audio arrives on a receiver thread."""
+
+    def __init__(self, on_audio, send_text, send_flush, close):
+        self.on_audio = on_audio
+        self._send_text = send_text
+        self._send_flush = send_flush
+        self._close = close
+        self._flushed = threading.Event()
+        self._unflushed = False  # Text sent whose audio has not all arrived
+
+    def on_flushed(self):
+        self._flushed.set()
+
+    def synthesize(self, text):
+        self._unflushed = True
+        self._send_text(text)
+        return None
+
+    def flush(self):
+        self._flushed.clear()
+        self._send_flush()
+        if self._flushed.wait(FLUSH_TIMEOUT):
+            self._unflushed = False
+        else:
+            print("Timed out waiting for the TTS flush")
+        return None
+
+    def close(self):
+        self._close(not self._unflushed)
+
+
+class _PushBackend(TTSBackend):
+    """Stream bookkeeping for backends whose audio arrives on a receiver thread.
+
+    A stream closed before its audio was flushed, e.g. on barge-in, sends
+    Clear, and incoming audio is dropped until the server answers Cleared,
+    so the rest of the interrupted reply never reaches the next stream on
+    the reused connection.
+    """
+
+    def __init__(self):
+        self._stream = None
+        self._cleared = threading.Event()
+        self._cleared.set()
+        self.clears = 0
+
+    def _send_clear(self):
+        raise NotImplementedError
+
+    def _disconnect(self):
+        raise NotImplementedError
+
+    def _on_audio(self, data):
+        stream = self._stream
+        if stream is not None and self._cleared.is_set():
+            stream.on_audio(data)
+
+    def _on_flushed(self):
+        stream = self._stream
+        if stream is not None and self._cleared.is_set():
+            stream.on_flushed()
+
+    def _on_cleared(self):
+        self._cleared.set()
+
+    def _end_stream(self, flushed):
+        self._stream = None
+        if flushed:
+            return
+        self._cleared.clear()
+        self.clears += 1
+        try:
+            self._send_clear()
+        except Exception as e:
+            print(f"Could not clear the TTS stream, reconnecting: {e}")
+            self._disconnect()
+            self._cleared.set()
+
+    def _wait_cleared(self):
+        if not self._cleared.wait(CLEAR_TIMEOUT):
+            print("Timed out waiting for the TTS Clear, reconnecting")
+            self._disconnect()
+            self._cleared.set()
+
+
+class DeepgramSpeakBackend(_PushBackend):
+    """Deepgram Aura over the raw speak websocket, as in tts3.py and TTS2.PY.
+
+    One websocket is kept open and reused by every stream.
+    """
+
+    name = "deepgram"
+
+    def __init__(self, api_key=None, model=DEEPGRAM_MODEL, sample_rate=DEEPGRAM_SAMPLE_RATE, url=DEEPGRAM_SPEAK_URL):
+        super().__init__()
+        self.api_key = api_key or os.getenv("DEEPGRAM_API_KEY")
+        self.voice = model
+        self.sample_rate = sample_rate
+        self.url = f"{url}?encoding=linear16&sample_rate={sample_rate}&model={model}"
+        self._socket = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        from websockets.sync.client import connect
+        self._socket = connect(self.url, additional_headers={"Authorization": f"Token {self.api_key}"})
+        threading.Thread(target=self._receive, args=(self._socket,), daemon=True).start()
+
+    def _receive(self, socket):
+        try:
+            for message in socket:
+                if isinstance(message, bytes):
+                    self._on_audio(message)
+                    continue
+                message_type = json.loads(message).get("type")
+                if message_type == "Flushed":
+                    self._on_flushed()
+                elif message_type == "Cleared":
+                    self._on_cleared()
+        except Exception as e:
+            print(f"Deepgram speak receiver error: {e}")
+        finally:
+            if self._socket is socket:
+                self._socket = None
+
+    def open_stream(self, on_audio):
+        self._wait_cleared()
+        with self._lock:
+            if self._socket is None:
+                self._connect()
+        self._stream = _PushStream(
+            on_audio,
+            lambda text: self._socket.send(json.dumps({"type": "Speak", "text": text})),
+            lambda: self._socket.send(json.dumps({"type": "Flush"})),
+            self._end_stream,
+        )
+        return self._stream
+
+    def _send_clear(self):
+        self._socket.send(json.dumps({"type": "Clear"}))
+
+    def _disconnect(self):
+        socket, self._socket = self._socket, None
+        if socket is not None:
+            socket.close()
+
+    def delete(self):
+        socket, self._socket = self._socket, None
+        if socket is not None:
+            try:
+                socket.send(json.dumps({"type": "Close"}))
+            finally:
+                socket.close()
+
+
+class DeepgramSDKBackend(_PushBackend):
+    """Deepgram Aura through the SDK speak websocket client, as in tts.py."""
+
+    name = "deepgram-sdk"
+
+    def __init__(self, api_key="", model=DEEPGRAM_MODEL, sample_rate=DEEPGRAM_SAMPLE_RATE, url=""):
+        from deepgram import DeepgramClient, DeepgramClientOptions
+        super().__init__()
+        self.voice = model
+        self.sample_rate = sample_rate
+        self.model = model
+        self.deepgram = DeepgramClient(api_key, DeepgramClientOptions(url=url))
+        self._connection = None
+
+    def _connect(self):
+        from deepgram import SpeakWebSocketEvents, SpeakWSOptions
+        connection = self.deepgram.speak.websocket.v("1")
+        connection.on(SpeakWebSocketEvents.AudioData, lambda client, data, **kwargs: self._on_audio(data))
+        connection.on(SpeakWebSocketEvents.Flushed, lambda client, flushed, **kwargs: self._on_flushed())
+        connection.on(SpeakWebSocketEvents.Cleared, lambda client, cleared, **kwargs: self._on_cleared())
+        options = SpeakWSOptions(model=self.model, encoding="linear16", sample_rate=self.sample_rate)
+        if connection.start(options) is False:
+            raise RuntimeError("Failed to start the Deepgram speak connection")
+        self._connection = connection
+
+    def open_stream(self, on_audio):
+        self._wait_cleared()
+        if self._connection is None or not self._connection.is_connected():
+            self._connect()
+        self._stream = _PushStream(on_audio, self._connection.send_text, self._connection.flush, self._end_stream)
+        return self._stream
+
+    def _send_clear(self):
+        if not self._connection.clear():
+            raise RuntimeError("Clear was not sent")
+
+    def _disconnect(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            connection.finish()
+
+    def delete(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            connection.finish()
+
+
+BACKENDS = {
+    OrcaBackend.name: OrcaBackend,
+    DeepgramSpeakBackend.name: DeepgramSpeakBackend,
+    DeepgramSDKBackend.name: DeepgramSDKBackend,
+}
+
+
+def register_backend(name, factory):
+    BACKENDS[name] = factory
+
+
+def create_backend(name, **kwargs):
+    try:
+        factory = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown TTS backend {name!r}; choose from {', '.join(sorted(BACKENDS))}") from None
+    return factory(**kwargs)
@@ -0,0 +1,148 @@
+import os
+import threading
+from queue import Empty, Queue
+from audio_output import shared_output
+from pcm_cache import PCMCache
+from tracing import Tracer
+
+PCM_CACHE_DIR = os.getenv("PCM_CACHE_DIR", "pcm_cache")
+
+
+def drain_queue(queue):
+    while True:
+        try:
+            queue.get_nowait()
+        except Empty:
+            return
+
+
+class TTSManager:
+    """Speaks streamed text through a TTS backend into a queued source on the shared output.
+
+    Fixed phrases come from the PCM cache when they are in it. interrupt()
+    stops speech at once, e.g. on barge-in. Spans go to tracer.
+    """
+
+    def __init__(self, backend_factory, pcm_cache_dir=PCM_CACHE_DIR, output=None, tracer=None):
+        self.backend_factory = backend_factory
+        self.output = output or shared_output()
+        self.tracer = tracer or Tracer(enabled=False)
+        self.backend = backend_factory()
+        self.pcm_cache = PCMCache(pcm_cache_dir, self.backend.voice, self.backend.sample_rate) if pcm_cache_dir else None
+        self.text_queue = Queue()
+        self.source = None
+        self.stop_event = threading.Event()
+        self.synthesis_thread = None
+        self.pcm_started = False
+
+    def synthesize_speech(self, source):
+        self.pcm_started = False
+        stream = self.backend.open_stream(self.queue_audio)
+        while not self.stop_event.is_set():
+            try:
+                text_chunk = self.text_queue.get(timeout=0.1)
+                if text_chunk is None:
+                    break
+                pcm = stream.synthesize(text_chunk)
+                if pcm is not None:
+                    self.queue_audio(pcm)
+            except Empty:
+                continue
+
+        if not self.stop_event.is_set():
+            pcm = stream.flush()
+            if pcm is not None:
+                self.queue_audio(pcm)
+        stream.close()
+        source.end()  # Plays out whatever is buffered, then finishes
+
+    def queue_audio(self, pcm):
+        # Also called by websocket backends from their receiver thread
+        if not self.stop_event.is_set():
+            if not self.pcm_started:
+                self.pcm_started = True
+                self.tracer.mark("tts_first_pcm")
+            self.source.write(pcm)  # Blocks while the source holds SOURCE_BUFFER_SECONDS of audio
+
+    def start_stream(self):
+        if self.stop_event.is_set() and self.synthesis_thread is not None:
+            self.synthesis_thread.join()  # An interrupted stream is still shutting down
+        if not self.is_busy():
+            # Drop anything an interrupted stream left behind
+            drain_queue(self.text_queue)
+        self.stop_event.clear()
+
+        if self.synthesis_thread is None or not self.synthesis_thread.is_alive():
+            # Queued behind anything still playing on the shared output
+            self.source = self.output.open_source(
+                self.backend.sample_rate, queue=True, on_start=self.on_playback_start)
+            self.synthesis_thread = threading.Thread(target=self.synthesize_speech, args=(self.source,))
+            self.synthesis_thread.start()
+
+    def on_playback_start(self):
+        self.tracer.mark("playback_first_write")
+        self.tracer.mark("final_to_first_audio", since="stt_final")
+
+    def feed(self, text):
+        self.text_queue.put(text)
+
+    def end_stream(self):
+        self.text_queue.put(None)  # Signal end of text
+
+    def speak(self, text, cache=False):
+        if self.pcm_cache is not None:
+            pcm = self.pcm_cache.get(text)
+            if pcm is None and cache:
+                pcm = self.pcm_cache.put(text, self.backend.synthesize(text))
+            if pcm is not None:
+                self.stop_event.clear()
+                self.source = self.output.play(
+                    pcm, self.backend.sample_rate, queue=True, on_start=lambda: self.tracer.mark("cached_first_write"))
+                return
+
+        self.start_stream()
+        self.feed(text)
+        self.end_stream()
+
+    def prewarm(self, phrases):
+        if self.pcm_cache is not None:
+            self.pcm_cache.prewarm(phrases, self.backend.synthesize)
+
+    def is_busy(self):
+        if self.synthesis_thread is not None and self.synthesis_thread.is_alive():
+            return True
+        return self.source is not None and not self.source.done.is_set()
+
+    def interrupt(self):
+        """Stop speaking now; returns without waiting for the synthesis thread to exit."""
+        self.stop_event.set()
+        drain_queue(self.text_queue)
+        self.text_queue.put(None)  # Wake the synthesis thread if it is blocked on an empty queue
+        if self.source is not None:
+            self.source.stop()
+
+    def wait_for_completion(self, timeout=None):
+        if self.synthesis_thread:
+            self.synthesis_thread.join(timeout)
+        if self.source:
+            self.source.wait(timeout)
+
+    def cleanup(self):
+        self.interrupt()
+        self.wait_for_completion()
+        if self.backend:
+            self.backend.delete()
+            self.backend = None
+
+    def reset(self, rebuild=False):
+        # The TTS engine and the output device stay open between conversations unless the engine has to be rebuilt after an error
+        self.interrupt()
+        self.wait_for_completion()
+        if rebuild or self.backend is None:
+            if self.backend:
+                self.backend.delete()
+            self.backend = self.backend_factory()
+        self.text_queue = Queue()
+        self.stop_event.clear()
+        self.synthesis_thread = None
+        self.source = None
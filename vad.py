@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+
+def frame_rms(frame):
+    """RMS level of an int16 PCM frame given as bytes or an array."""
+    if isinstance(frame, (bytes, bytearray, memoryview)):
+        samples = np.frombuffer(frame, dtype=np.int16)
+    else:
+        samples = np.asarray(frame, dtype=np.int16)
+    if len(samples) == 0:
+        return 0.0
+    samples = samples.astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples)))
+
+
+class EnergyVAD:
+    """Energy based voice activity detector working on int16 PCM frames.
+
+    feed() returns True once speech_frames consecutive frames are at or
+    above the RMS threshold.
+    """
+
+    def __init__(self, threshold=500, speech_frames=3):
+        self.threshold = threshold
+        self.speech_frames = speech_frames
+        self._run = 0
+
+    def is_speech(self, frame):
+        return frame_rms(frame) >= self.threshold
+
+    def feed(self, frame):
+        if self.is_speech(frame):
+            self._run += 1
+        else:
+            self._run = 0
+        return self._run >= self.speech_frames
+
+    def reset(self):
+        self._run = 0
+
+
+class VADGate:
+    """Forwards int16 PCM frames (bytes) to send() only around speech.
+
+    Sending starts at speech onset, preceded by the last preroll_frames
+    frames, and stops after hangover seconds of silence; in between, frames
+    are dropped and keepalive() is called every keepalive_interval seconds so
+    the connection stays open. on_speech_end() fires once end_of_utterance
+    seconds after the user stops talking, ahead of the server's endpointing.
+    """
+
+    def __init__(self, send, keepalive=None, on_speech_end=None, vad=None, sample_rate=16000,
+                 hangover=1.0, end_of_utterance=0.7, preroll_frames=5, keepalive_interval=5, clock=time.monotonic):
+        self.send = send
+        self.keepalive = keepalive
+        self.on_speech_end = on_speech_end
+        self.vad = vad or EnergyVAD()
+        self.sample_rate = sample_rate
+        self.hangover = hangover
+        self.end_of_utterance = end_of_utterance
+        self.keepalive_interval = keepalive_interval
+        self.clock = clock
+        self.preroll = deque(maxlen=preroll_frames)
+        self.active = False
+        self.in_speech = False
+        self.silence = 0.0
+        self.bytes_total = 0
+        self.bytes_sent = 0
+        self.keepalives = 0
+        self._last_sent = clock()
+
+    @property
+    def bytes_saved(self):
+        return self.bytes_total - self.bytes_sent
+
+    def feed(self, frame):
+        self.bytes_total += len(frame)
+        if self.vad.feed(frame):
+            self.silence = 0.0
+            self.in_speech = True
+            if not self.active:
+                self.active = True
+                for held in self.preroll:
+                    self._send(held)
+                self.preroll.clear()
+        else:
+            self.silence += len(frame) / 2 / self.sample_rate
+
+        if self.active:
+            self._send(frame)
+            if self.silence >= self.hangover:
+                self.active = False
+        else:
+            self.preroll.append(frame)
+            if self.keepalive is not None and self.clock() - self._last_sent >= self.keepalive_interval:
+                self.keepalive()
+                self.keepalives += 1
+                self._last_sent = self.clock()
+
+        if self.in_speech and self.silence >= self.end_of_utterance:
+            self.in_speech = False
+            if self.on_speech_end is not None:
+                self.on_speech_end()
+
+    def reset(self):
+        self.vad.reset()
+        self.preroll.clear()
+        self.active = False
+        self.in_speech = False
+        self.silence = 0.0
+
+    def _send(self, frame):
+        self.send(frame)
+        self.bytes_sent += len(frame)
+        self._last_sent = self.clock()
+
+
+class BargeInMonitor:
+    """Sits between the microphone and STT and watches for user speech while Pixie talks.
+
+    While armed, frames are held back from STT (so Pixie's own voice is not
+    transcribed) and run through the VAD. On speech, on_barge_in() is called
+    and the held frames, the last preroll_frames of them, are sent to STT in
+    order so the start of the user's sentence is not lost; disarm() drops
+    them instead. Frames are counted in samples from position, and
+    arm(at=position) arms once that point of the capture is reached, e.g.
+    where the greeting starts.
+    """
+
+    def __init__(self, send, on_barge_in, vad=None, preroll_frames=8, position=0):
+        self.send = send
+        self.on_barge_in = on_barge_in
+        self.vad = vad or EnergyVAD()
+        self.preroll = deque(maxlen=preroll_frames)
+        self.position = position
+        self.armed = False
+        self.interruptions = 0
+        self._arm_at = None
+        self._lock = threading.Lock()
+
+    def arm(self, at=None):
+        with self._lock:
+            self.vad.reset()
+            self.preroll.clear()
+            if at is None or at <= self.position:
+                self.armed, self._arm_at = True, None
+            else:
+                self.armed, self._arm_at = False, at
+
+    def disarm(self):
+        with self._lock:
+            self.armed, self._arm_at = False, None
+            self.preroll.clear()
+
+    def feed(self, frame):
+        with self._lock:
+            self.position += len(frame) // 2
+            if self._arm_at is not None and self.position > self._arm_at:
+                self.armed, self._arm_at = True, None
+            if not self.armed:
+                self.send(frame)
+                return
+            self.preroll.append(frame)
+            if not self.vad.feed(frame):
+                return
+            self.armed = False
+            self.interruptions += 1
+            self.on_barge_in()
+            for held in self.preroll:
+                self.send(held)
+            self.preroll.clear()
@@ -1,54 +1,74 @@
 import os
+import re
+import time
 from dotenv import load_dotenv
-from groq import Groq
-from playwright.sync_api import sync_playwright
-from playwright_stealth import stealth_sync
+from groq import NOT_GIVEN, Groq
+from cache import SQLiteTTLCache
+from scraper import PlaywrightWebKitScraper
+from weather_trim import extract_report, trim_weather_text
 # Load API key from .env file
 load_dotenv()
 api_key = os.getenv("GROQ_API_KEY")
 client = Groq(api_key=api_key)
 
-class PlaywrightWebKitScraper:
-    def __init__(self, headless=True):
-        # Start Playwright and launch WebKit browser in headless mode
-        self.playwright = sync_playwright().start()
-        self.browser = self.playwright.webkit.launch(headless=headless)
+# Scraped pages keyed by URL and extracted reports keyed by location, kept across restarts.
+# Stale entries are still served for STALE_TTL seconds while a refresh runs in the background.
+WEATHER_CACHE_PATH = os.getenv("WEATHER_CACHE_PATH", "weather_cache.sqlite3")
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "300"))
+WEATHER_REPORT_TTL = int(os.getenv("WEATHER_REPORT_TTL", "900"))
+WEATHER_STALE_TTL = int(os.getenv("WEATHER_STALE_TTL", "3600"))
+NO_INFO_TTL = 60
+WEATHER_TOKEN_BUDGET = int(os.getenv("WEATHER_TOKEN_BUDGET", "300"))
+WEATHER_FETCH_TIMEOUT = float(os.getenv("WEATHER_FETCH_TIMEOUT", "4"))  # Leaves time under the tool deadline to read the page
+page_cache = SQLiteTTLCache(WEATHER_CACHE_PATH or ":memory:", table="pages", max_size=32,
+                            ttl=PAGE_CACHE_TTL, stale_ttl=WEATHER_STALE_TTL)
+report_cache = SQLiteTTLCache(WEATHER_CACHE_PATH or ":memory:", table="weather_reports", max_size=128,
+                              ttl=WEATHER_REPORT_TTL, stale_ttl=WEATHER_STALE_TTL)
 
-        # Create a browser context (isolated session)
-        self.context = self.browser.new_context()
 
-    def get_page_text_content(self, url):
-        # Create a new page within the existing browser context
-        page = self.context.new_page()
-        stealth_sync(page)  # Use stealth to avoid detection
-        
-        # Block unnecessary resources like images, stylesheets, and fonts
-        def block_resources(route):
-            if route.request.resource_type in ['image', 'stylesheet', 'font']:
-                route.abort()
-            else:
-                route.continue_()
+def normalize_location(location):
+    return " ".join(re.sub(r"[^\w\s]", " ", location.lower()).split())
 
-        page.route("**/*", block_resources)
 
-        # Navigate to the target website and wait for the DOM to load
-        page.goto(url, wait_until='domcontentloaded')
+def weather_url(location):
+    query = "+".join(normalize_location(location).split())
+    return f"https://www.google.com/search?q=weather+in+{query}&sourceid=chrome&ie=UTF-8"
 
-        # Extract and return all visible text content from the body of the page
-        page_text = page.inner_text('body')
 
-        # Close the page (browser stays open for reuse)
-        page.close()
-        return page_text
+def get_page_text(scraper, url, allow_stale=True, timeout=WEATHER_FETCH_TIMEOUT):
+    return page_cache.fetch(url, lambda: scraper.get_page_text_content(url, timeout), allow_stale=allow_stale)
 
-    def close(self):
-        # Close the browser and stop Playwright when finished
-        self.browser.close()
-        self.playwright.stop()
+
+def report_from_page(page_text, budget=WEATHER_TOKEN_BUDGET, timeout=None):
+    """Read the report off the page when its weather widget is there, else ask the LLM about the relevant parts."""
+    report = extract_report(page_text)
+    if report is not None:
+        return report
+    trimmed = trim_weather_text(page_text, budget)
+    return get_weather(trimmed, timeout) if trimmed else "[NO_INFO]"
+
+
+def weather_report(scraper, location, timeout=None):
+    """Weather report for location, scraping and calling the LLM only when the cache has nothing usable.
+
+    timeout bounds a refresh: the scrape gets at most WEATHER_FETCH_TIMEOUT
+    of it and the LLM what is left.
+    """
+    def load():
+        end = None if timeout is None else time.monotonic() + timeout
+        fetch_timeout = WEATHER_FETCH_TIMEOUT if end is None else min(WEATHER_FETCH_TIMEOUT, timeout)
+        # A report refresh always reads a fresh page
+        page_text = get_page_text(scraper, weather_url(location), allow_stale=False, timeout=fetch_timeout)
+        return report_from_page(page_text, timeout=None if end is None else max(end - time.monotonic(), 0.1))
+
+    def ttl(report):
+        return NO_INFO_TTL if "[NO_INFO]" in report else None
+
+    return report_cache.fetch(normalize_location(location), load, ttl=ttl)
 
 
 # Function to query Groq API
-def get_weather(user_query):
+def get_weather(user_query, timeout=None):
     intent = client.chat.completions.create(
         model="gemma2-9b-it",
         messages=[
@@ -96,6 +116,7 @@ def get_weather(user_query):
         top_p=1,
         stream=False,
         stop=None,
+        timeout=NOT_GIVEN if timeout is None else timeout,
     )
 
     # Return the assistant's response
@@ -107,12 +128,13 @@ if __name__ == "__main__":
     print("Loaded")
     LOCATION = input("Enter your location: ")
 
-    url = f"https://www.google.com/search?q=weather+in+{LOCATION}&sourceid=chrome&ie=UTF-8"  # Replace with your target URL
-    content = scraper.get_page_text_content(url)
-    response = get_weather(content)
+    response = weather_report(scraper, LOCATION)
   
 
     print(response)
+    print(f"Page cache: {page_cache.stats()}")
+    print(f"Report cache: {report_cache.stats()}")
+    scraper.close()
 
 
 
@@ -0,0 +1,162 @@
+import re
+from history import estimate_tokens
+
+WEATHER_TOKEN_BUDGET = 300
+MAX_BLOCK_LINES = 8
+
+WEATHER_WORDS = {
+    "weather", "forecast", "temperature", "temp", "precipitation", "humidity", "wind", "rain", "showers",
+    "drizzle", "thunderstorm", "thunderstorms", "storm", "snow", "sleet", "hail", "sunny", "clear", "cloudy",
+    "clouds", "overcast", "mist", "fog", "haze", "humid", "high", "low", "feels", "uv", "pressure", "dew",
+    "chance", "gusts", "sunrise", "sunset", "tonight", "today", "tomorrow",
+}
+NOISE_PHRASES = (
+    "sign in", "privacy", "terms", "feedback", "settings", "all filters", "learn more", "people also ask",
+    "cookies", "accessibility", "skip to main content", "send feedback", "images", "videos", "shopping",
+)
+CONDITION_WORDS = (
+    "clear", "sunny", "cloudy", "clouds", "overcast", "mist", "fog", "haze", "rain", "showers", "drizzle",
+    "thunderstorm", "storm", "snow", "sleet", "hail", "fair", "smoke", "dust", "windy", "flurries",
+)
+RAIN_WORDS = ("rain", "showers", "drizzle", "thunderstorm", "storm")
+
+UNIT_RE = re.compile(r"-?\d+(?:\.\d+)?\s*(?:°\s*[CF]?|%|km/h|mph|m/s|kph|mm\b|hpa\b|mb\b)", re.I)
+DAY_RE = re.compile(r"\b(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday|mon|tue|wed|thu|fri|sat|sun)\b", re.I)
+DAY_ABBREVIATION_RE = re.compile(r"(Mon|Tue|Wed|Thu|Fri|Sat|Sun)")
+TEMP_INLINE_RE = re.compile(r"(-?\d{1,3})\s*°\s*([CF])(?:\s*\|\s*°\s*[CF])?")
+TEMP_UNIT_RE = re.compile(r"°\s*([CF])\b.*")
+FORECAST_TEMP_RE = re.compile(r"(-?\d{1,3})\s*°")
+PRECIPITATION_RE = re.compile(r"Precipitation:?\s*(\d{1,3})\s*%", re.I)
+HUMIDITY_RE = re.compile(r"Humidity:?\s*(\d{1,3})\s*%", re.I)
+WIND_RE = re.compile(r"Wind:?\s*(\d+\s*(?:km/h|mph|m/s))", re.I)
+
+
+def split_blocks(text):
+    """Paragraphs of the page text, with long ones cut every MAX_BLOCK_LINES lines."""
+    blocks = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        lines = [line.strip() for line in paragraph.splitlines() if line.strip()]
+        for start in range(0, len(lines), MAX_BLOCK_LINES):
+            blocks.append("\n".join(lines[start:start + MAX_BLOCK_LINES]))
+    return blocks
+
+
+def score_block(block):
+    """Weather relevance per token: keywords, numbers with units and day names, minus page chrome."""
+    lowered = block.lower()
+    words = set(re.findall(r"[a-z]+", lowered))
+    score = 2 * len(words & WEATHER_WORDS)
+    score += 3 * min(len(UNIT_RE.findall(block)), 12)
+    score += min(len(DAY_RE.findall(block)), 7)
+    score -= 3 * sum(phrase in lowered for phrase in NOISE_PHRASES)
+    return score / (1 + estimate_tokens(block) / 50)
+
+
+def trim_weather_text(text, budget=WEATHER_TOKEN_BUDGET):
+    """The most weather-relevant blocks of text that fit in budget tokens, in page order.
+
+    Returns "" when nothing on the page looks like weather.
+    """
+    blocks = split_blocks(text)
+    ranked = sorted((index for index, block in enumerate(blocks) if score_block(block) > 0),
+                    key=lambda index: score_block(blocks[index]), reverse=True)
+    kept = []
+    used = 0
+    for index in ranked:
+        tokens = estimate_tokens(blocks[index])
+        if used + tokens <= budget:
+            kept.append(index)
+            used += tokens
+    return "\n\n".join(blocks[index] for index in sorted(kept))
+
+
+def is_condition(line):
+    lowered = line.lower()
+    return (len(line.split()) <= 4 and re.fullmatch(r"[A-Za-z ]+", line) is not None
+            and any(word in lowered for word in CONDITION_WORDS))
+
+
+def parse_weather(text):
+    """Read the weather widget of a search results page.
+
+    Returns a dict with condition, temp, unit, precipitation, humidity, wind,
+    rain_today and forecast [(day, condition or None, high, low)], or None
+    when any of it is missing.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    temp = unit = temp_index = None
+    for index, line in enumerate(lines):
+        match = TEMP_INLINE_RE.fullmatch(line)
+        if match:
+            temp, unit, temp_index = match.group(1), match.group(2), index
+            break
+        if re.fullmatch(r"-?\d{1,3}", line) and index + 1 < len(lines):
+            match = TEMP_UNIT_RE.fullmatch(lines[index + 1])
+            if match:
+                temp, unit, temp_index = line, match.group(1), index
+                break
+    if temp is None:
+        return None
+
+    nearby = lines[max(0, temp_index - 4):temp_index][::-1] + lines[temp_index + 1:temp_index + 8]
+    condition = next((line for line in nearby if is_condition(line)), None)
+    widget = "\n".join(lines[temp_index:temp_index + 12])
+    precipitation = PRECIPITATION_RE.search(widget)
+    humidity = HUMIDITY_RE.search(widget)
+    wind = WIND_RE.search(widget)
+    if condition is None or not (precipitation and humidity and wind):
+        return None
+
+    forecast = []
+    index = temp_index + 1
+    while index < len(lines) and len(forecast) < 8:
+        if DAY_ABBREVIATION_RE.fullmatch(lines[index]):
+            following = lines[index + 1:index + 4]
+            day_condition = following[0] if following and is_condition(following[0]) else None
+            temps = [FORECAST_TEMP_RE.fullmatch(line) for line in following[1 if day_condition else 0:]][:2]
+            if len(temps) == 2 and all(temps):
+                forecast.append((lines[index], day_condition, temps[0].group(1), temps[1].group(1)))
+                index += 3 if day_condition is None else 4
+                continue
+        index += 1
+    # The first forecast day is today
+    upcoming = forecast[1:3]
+    if len(upcoming) < 2:
+        return None
+
+    precipitation = int(precipitation.group(1))
+    rain_today = precipitation >= 50 or any(word in condition.lower() for word in RAIN_WORDS)
+    return {
+        "condition": condition,
+        "temp": temp,
+        "unit": unit,
+        "precipitation": precipitation,
+        "humidity": int(humidity.group(1)),
+        "wind": wind.group(1),
+        "rain_today": rain_today,
+        "forecast": upcoming,
+    }
+
+
+def format_report(weather):
+    """weather as the report format get_weather() asks the LLM for."""
+    unit = weather["unit"]
+    lines = [
+        f"- Condition: {weather['condition']}",
+        f"- Temp: {weather['temp']}°{unit}",
+        f"- Precipitation: {weather['precipitation']}%",
+        f"- Humidity: {weather['humidity']}%",
+        f"- Wind: {weather['wind']}",
+        f"- Rain Today: {'Yes' if weather['rain_today'] else 'No'}",
+        "",
+        "Forecast:",
+    ]
+    for number, (day, condition, high, low) in enumerate(weather["forecast"], 1):
+        lines.append(f"Day {number}: {condition or day}, High: {high}°{unit}, Low: {low}°{unit}")
+    return "\n".join(lines)
+
+
+def extract_report(text):
+    """The weather report read straight off the page, or None if the page needs the LLM."""
+    weather = parse_weather(text)
+    return format_report(weather) if weather is not None else None
@@ -1,37 +1,181 @@
-import wikipedia
+import os
 import re
+import sqlite3
+import threading
+import time
 import warnings
-from bs4 import GuessedAtParserWarning
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
+
+WIKI_RESULTS = 5
+WIKI_WORKERS = 4
+WIKI_DEADLINE = float(os.getenv("WIKI_DEADLINE", "3.0"))  # Seconds for the search and all page fetches
+WIKI_INDEX_PATH = os.getenv("WIKI_INDEX_PATH", "wiki_index.sqlite3")
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "for", "and", "or", "is", "are", "was", "were", "be",
+    "what", "who", "whom", "which", "when", "where", "why", "how", "do", "does", "did", "about", "tell", "me",
+    "i", "you", "it", "its", "can", "could", "please", "know", "some", "that", "this", "there",
+}
 
 def clean_text(text):
     return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', '', text)).strip()
 
-def safe_wikipedia_page(title):
+def safe_wikipedia_page(title, module=None):
+    if module is None:
+        import wikipedia as module
+    try:
+        from bs4 import GuessedAtParserWarning
+    except ImportError:
+        return module.page(title)
     with warnings.catch_warnings():
         warnings.filterwarnings("ignore", category=GuessedAtParserWarning)
-        return wikipedia.page(title)
+        return module.page(title)
+
+def query_terms(query):
+    return [term for term in clean_text(query).lower().split() if term not in STOPWORDS]
+
+
+class SummaryIndex:
+    """Wikipedia summaries in a SQLite FTS5 table.
+
+    Summaries are stored as clean_text() left them, with the queries that
+    found them, so a repeated query is answered from its recorded titles and
+    a similar one from a full-text match on all of its (stemmed) terms.
+    """
+
+    def __init__(self, path=WIKI_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS summaries USING fts5(title, summary, "
+                             "fetched_at UNINDEXED, tokenize = 'porter unicode61')")
+            self._db.execute("CREATE TABLE IF NOT EXISTS queries (query TEXT PRIMARY KEY, titles TEXT NOT NULL)")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def add(self, title, summary):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM summaries WHERE title = ?", (title,))
+            self._db.execute("INSERT INTO summaries VALUES (?, ?, ?)", (title, summary, time.time()))
+
+    def remember_query(self, query, titles):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO queries VALUES (?, ?)", (" ".join(query_terms(query)),
+                                                                              "\n".join(titles)))
+
+    def get(self, title):
+        with self._lock:
+            row = self._db.execute("SELECT summary FROM summaries WHERE title = ?", (title,)).fetchone()
+        return row[0] if row else None
+
+    def search(self, query, limit=WIKI_RESULTS):
+        """[(title, summary)] for query from the index alone, best first."""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            row = self._db.execute("SELECT titles FROM queries WHERE query = ?", (" ".join(terms),)).fetchone()
+        if row is not None:
+            found = [(title, self.get(title)) for title in row[0].split("\n") if title]
+            found = [(title, summary) for title, summary in found if summary]
+            if found:
+                return found[:limit]
+        match = " ".join('"' + term.replace('"', '') + '"' for term in terms)
+        with self._lock:
+            # Title matches count ten times as much as summary matches
+            return self._db.execute("SELECT title, summary FROM summaries WHERE summaries MATCH ? "
+                                    "ORDER BY bm25(summaries, 10.0, 1.0) LIMIT ?", (match, limit)).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class WikipediaLookup:
+    """Searches Wikipedia and fetches the top pages concurrently within a deadline.
+
+    Pages that are disambiguations, missing or late are left out; late ones
+    still finish in the background and go into the index for next time.
+    wikipedia_module defaults to the wikipedia package and can be any object
+    with the same search(), page(), DisambiguationError and PageError.
+    """
+
+    def __init__(self, wikipedia_module=None, index=None, workers=WIKI_WORKERS, deadline=WIKI_DEADLINE,
+                 results=WIKI_RESULTS):
+        if wikipedia_module is None:
+            import wikipedia as wikipedia_module
+        self.wikipedia = wikipedia_module
+        self.index = index if index is not None else SummaryIndex(WIKI_INDEX_PATH or ":memory:")
+        self.deadline = deadline
+        self.results = results
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.index_hits = 0
+        self.network_lookups = 0
+        self.late_pages = 0
+
+    def _fetch_summary(self, title):
+        try:
+            page = safe_wikipedia_page(title, self.wikipedia)
+        except (self.wikipedia.DisambiguationError, self.wikipedia.PageError):
+            return None
+        summary = clean_text(page.summary)
+        self.index.add(page.title, summary)
+        return page.title, summary
+
+    def lookup(self, query, deadline=None):
+        """[(title, summary)] for query, in search order; the index is tried before the network."""
+        found = self.index.search(query, self.results)
+        if found:
+            self.index_hits += 1
+            return found
+        self.network_lookups += 1
+        end = time.monotonic() + (self.deadline if deadline is None else deadline)
+        search = self.executor.submit(self.wikipedia.search, query)
+        try:
+            titles = search.result(timeout=max(end - time.monotonic(), 0))[:self.results]
+        except TimeoutError:
+            return []
+        futures = [self.executor.submit(self._fetch_summary, title) for title in titles]
+        done, pending = wait(futures, timeout=max(end - time.monotonic(), 0))
+        self.late_pages += len(pending)
+        found = []
+        for future in futures:
+            if future not in done:
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Wikipedia page fetch failed: {e}")
+                continue
+            if result is not None:
+                found.append(result)
+        if found:
+            self.index.remember_query(query, [title for title, _ in found])
+        return found
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.index.close()
+
 
 def search_wikipedia():
     query = input("Enter your search query: ")
-    
+
     try:
-        search_results = wikipedia.search(query)
-        
-        if not search_results:
+        lookup = WikipediaLookup()
+        results = lookup.lookup(query)
+
+        if not results:
             print("No results found for your query.")
             return
-        
-        for i, result in enumerate(search_results[:5], 1):
-            try:
-                page = safe_wikipedia_page(result)
-                summary = clean_text(page.summary)
-                print(f"{summary[:300]}...")  # Print first 300 characters
 
-            except (wikipedia.DisambiguationError, wikipedia.PageError):
-                continue
-        
+        for title, summary in results:
+            print(f"{summary[:300]}...")  # Print first 300 characters
+
     except Exception as e:
         print(f"An error occurred: {str(e)}")
 
 if __name__ == "__main__":
-    search_wikipedia()
\ No newline at end of file
+    search_wikipedia()